@@ -6,6 +6,13 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_session import Session
 from database import db
+from database.schema import ensure_search_schema
+from database.genre_operations import ensure_genre_facets
+from database.isbn_operations import ensure_isbn_aliases
+from database.sync_operations import ensure_unlogged_sync_staging
+from database.autocomplete_operations import rebuild_autocomplete_index
+from cli import register_cli
+from response_pipeline import setup_response_pipeline
 
 # Import blueprintů
 from routes import books, users, comments, ratings, favorites, shopping_cart, orders, audit
@@ -63,7 +70,9 @@ def create_app():
     - Setting up database connection
     - Configuring session management
     - Setting up logging
+    - Configuring JSON encoding and response compression
     - Registering application blueprints
+    - Registering custom flask CLI commands
 
     Returns:
         Flask: Fully configured Flask application instance
@@ -93,6 +102,13 @@ def create_app():
    app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(__file__), 'sessions')
    os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
+   # Catalog sync jobs - spooled payloads waiting for the background worker
+   app.config['SYNC_JOB_DIR'] = os.path.join(os.path.dirname(__file__), 'sync_jobs')
+   os.makedirs(app.config['SYNC_JOB_DIR'], exist_ok=True)
+
+   # Full-text search - strip diacritics (requires the unaccent extension)
+   app.config['BOOK_SEARCH_UNACCENT'] = os.environ.get('BOOK_SEARCH_UNACCENT', 'true').lower() == 'true'
+
    # Initialize extensions
    db.init_app(app)
    migrate = Migrate(app, db)
@@ -101,6 +117,10 @@ def create_app():
    # Setup logging
    setup_logging(app)
 
+   # JSON encoding (orjson when installed) and gzip/brotli response compression
+   app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+   setup_response_pipeline(app)
+
    # Register blueprints
    app.register_blueprint(books.bp)
    app.register_blueprint(users.bp)
@@ -111,6 +131,9 @@ def create_app():
    app.register_blueprint(orders.bp)
    app.register_blueprint(audit.audit_bp)
 
+   # Register CLI commands (flask catalog ...)
+   register_cli(app)
+
    return app
 
 # Create app instance
@@ -135,13 +158,25 @@ with app.app_context():
    """
     Initialize database tables within the application context.
 
-    Attempts to create all database tables defined in the models.
+    Prepares the full-text search configuration the book table depends on,
+    then attempts to create all database tables defined in the models
+    and fills the genre facet and ISBN alias tables if they are empty (and
+    converts an old logged sync staging table to UNLOGGED). Finally builds
+    the in-memory autocomplete index.
     Logs a success message or captures and logs any errors during
     table creation.
     """
    try:
+       ensure_search_schema(app.config['BOOK_SEARCH_UNACCENT'])
        db.create_all()
        app.logger.info('Databázové tabulky byly úspěšně vytvořeny')
+       if ensure_genre_facets():
+           app.logger.info('Počty knih podle žánrů byly přepočítány')
+       if ensure_isbn_aliases():
+           app.logger.info('Tabulka aliasů ISBN byla naplněna')
+       if ensure_unlogged_sync_staging():
+           app.logger.info('Tabulka catalog_sync_isbn byla převedena na UNLOGGED')
+       rebuild_autocomplete_index()
    except Exception as e:
        app.logger.error('Chyba při vytváření databázových tabulek: %s', str(e))
 
@@ -0,0 +1,123 @@
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from database.bulk_load_operations import bulk_load_csv, DEFAULT_CSV_COLUMNS
+from database.benchmark_operations import benchmark_search
+from database.idempotency_operations import purge_expired_idempotency_keys
+from response_pipeline import benchmark_responses
+
+catalog_cli = AppGroup('catalog', help='Catalog maintenance commands.')
+http_cli = AppGroup('http', help='HTTP response pipeline commands.')
+orders_cli = AppGroup('orders', help='Order maintenance commands.')
+
+@catalog_cli.command('load-csv')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--header', is_flag=True, help='The first line contains column names.')
+@click.option('--columns', default=None,
+              help='Comma-separated column order of a file without header '
+                   f'(default: {",".join(DEFAULT_CSV_COLUMNS)}).')
+@click.option('--encoding', default='UTF8', show_default=True,
+              help='File encoding as understood by PostgreSQL COPY.')
+@click.option('--delimiter', default=',', show_default=True, help='Column delimiter.')
+def load_csv_command(path, header, columns, encoding, delimiter):
+    """
+    Bulk-load a CSV (or gzip-compressed CSV) catalog snapshot.
+
+    The file is loaded with PostgreSQL COPY into staging tables and merged
+    into book, genre and book_genres in a single transaction. Books missing
+    from the snapshot are hidden and audit events are recorded exactly as
+    for /api/fetch_books.
+
+    Example:
+        flask catalog load-csv data/data_mock.csv
+    """
+    started = time.monotonic()
+    progress = bulk_load_csv(
+        path,
+        columns=columns.split(',') if columns else None,
+        header=header,
+        encoding=encoding,
+        delimiter=delimiter
+    )
+
+    if not progress['processed'] or progress['processed'] == progress['invalid']:
+        raise click.ClickException('Soubor neobsahuje žádné knihy s ISBN10')
+
+    click.echo(
+        f"Zpracováno {progress['processed']} záznamů za {time.monotonic() - started:.2f} s: "
+        f"aktualizováno {progress['updated']}, přidáno {progress['new']}, "
+        f"nezměněno {progress['skipped_unchanged']}, neplatných {progress['invalid']}"
+    )
+
+@catalog_cli.command('benchmark-search')
+@click.option('--rows', default=500000, show_default=True, help='Number of synthetic books.')
+@click.option('--repeat', default=5, show_default=True, help='Runs per query, the median is reported.')
+def benchmark_search_command(rows, repeat):
+    """
+    Benchmark the title, author and ISBN filters of /api/books.
+
+    Builds a synthetic catalog in a temporary table (nothing is written to
+    the real catalog) and reports the median latency of count + first page
+    for the old ILIKE query shapes on the baseline indexes (primary key and
+    unique ISBN13 only) and for the current query shapes with all Book
+    indexes.
+    """
+    click.echo(f'Generuji {rows} syntetických knih...')
+    results = benchmark_search(rows=rows, repeat=repeat)
+
+    click.echo(f"{'filtr':<32}{'nalezeno':>10}{'před [ms]':>12}{'po [ms]':>12}{'zrychlení':>11}  indexy")
+    for result in results:
+        speedup = result['before_ms'] / result['after_ms'] if result['after_ms'] else float('inf')
+        click.echo(
+            f"{result['case']:<32}{result['matches']:>10}{result['before_ms']:>12.2f}"
+            f"{result['after_ms']:>12.2f}{speedup:>10.1f}x  {', '.join(result['indexes']) or '-'}"
+        )
+
+@http_cli.command('benchmark-responses')
+@click.option('--per-page', default=100, show_default=True, help='Page size of the measured list endpoints.')
+@click.option('--repeat', default=20, show_default=True, help='Requests per combination, the median is reported.')
+@click.option('--url', 'urls', multiple=True, help='Measure this URL instead of the default list endpoints.')
+def benchmark_responses_command(per_page, repeat, urls):
+    """
+    Benchmark response size and latency of the large list endpoints.
+
+    Every URL is requested through the application's test client with the
+    default and the orjson JSON provider and with identity, gzip and brotli
+    (when installed) encoding. Reported are the bytes sent over the wire
+    and the median request latency.
+    """
+    urls = urls or (f'/api/books?per_page={per_page}', f'/api/audit_logs?per_page={per_page}')
+    results = benchmark_responses(current_app, urls, repeat=repeat)
+
+    baselines = {}
+    click.echo(f"{'url':<36}{'status':>7}{'json':>9}{'kódování':>10}{'bajty':>10}{'poměr':>8}{'ms':>9}")
+    for result in results:
+        baseline = baselines.setdefault((result['url'], result['provider']), result['bytes'])
+        ratio = result['bytes'] / baseline if baseline else 1
+        click.echo(
+            f"{result['url']:<36}{result['status']:>7}{result['provider']:>9}{result['encoding']:>10}"
+            f"{result['bytes']:>10}{ratio:>8.2f}{result['ms']:>9.2f}"
+        )
+
+@orders_cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """
+    Delete expired idempotency keys of order requests.
+
+    Expired keys are also reused on the next request with the same key,
+    the purge only keeps the table small. Suitable for a daily cron job.
+    """
+    deleted = purge_expired_idempotency_keys()
+    click.echo(f'Smazáno prošlých idempotenčních klíčů: {deleted}')
+
+def register_cli(app):
+    """
+    Register custom flask CLI command groups on the application.
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(http_cli)
+    app.cli.add_command(orders_cli)
@@ -0,0 +1,235 @@
+# autocomplete_operations.py
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from itertools import groupby
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from database.book import Book, book_genres
+from database.genre import Genre
+from database.cache_operations import CacheVersionWatcher, CATALOG_SYNC_VERSION
+
+AUTOCOMPLETE_LIMIT = 10       # výchozí počet návrhů
+MAX_AUTOCOMPLETE_LIMIT = 50   # nejvyšší povolený počet návrhů
+# Prefixům s více klíči se nejlepší návrhy předpočítají při sestavení indexu,
+# dotaz tak nikdy neprochází víc klíčů než tento počet
+PRECOMPUTED_RANGE_SIZE = 256
+
+SUGGESTION_TITLE = 'title'
+SUGGESTION_AUTHOR = 'author'
+SUGGESTION_GENRE = 'genre'
+
+error_logger = logging.getLogger('error_logger')
+info_logger = logging.getLogger('info_logger')
+
+# Index se přestaví po každé dokončené synchronizaci katalogu (i v jiném procesu)
+_sync_version = CacheVersionWatcher(CATALOG_SYNC_VERSION, ())
+_index = None
+_rebuild_lock = threading.Lock()
+_rebuild_thread = None
+
+def normalize_text(value):
+    """
+    Normalizuje text pro porovnání prefixů - malá písmena, bez diakritiky
+    a s jednoduchými mezerami ("Karel  Čapek" -> "karel capek").
+    """
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())
+
+class AutocompleteIndex:
+    """
+    Neměnný prefixový index návrhů pro našeptávač vyhledávání.
+
+    Každý návrh (název knihy, autor nebo žánr) je v seřazeném poli klíčů
+    zařazen od začátku každého svého slova, takže "cap" najde i "Karel
+    Čapek". Rozsah klíčů s daným prefixem se najde binárním vyhledáváním;
+    pro prefixy s více než PRECOMPUTED_RANGE_SIZE klíči jsou nejlepší
+    návrhy předpočítané, takže cena dotazu nezávisí na velikosti katalogu.
+    Návrhy se řadí podle počtu hodnocení.
+    """
+
+    def __init__(self, suggestions, version=None):
+        """
+        Args:
+            suggestions: Iterable n-tic (typ, text, váha, isbn10 nebo None)
+            version: Verze synchronizace katalogu, ze které index vznikl
+        """
+        self.version = version
+        self.built_at = time.monotonic()
+        # Návrhy se číslují v pořadí řazení - lepší návrh má menší ID
+        self._items = sorted(
+            ((weight or 0, kind, text, isbn10) for kind, text, weight, isbn10 in suggestions),
+            key=lambda item: (-item[0], item[2])
+        )
+        entries = []
+        for item_id, (_, _, text, _) in enumerate(self._items):
+            normalized = normalize_text(text)
+            if not normalized:
+                continue
+            position = 0
+            for word in normalized.split(' '):
+                entries.append((normalized[position:], item_id))
+                position += len(word) + 1
+
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = [item_id for _, item_id in entries]
+
+        # Velké rozsahy prefixů délky n leží uvnitř velkých rozsahů délky n - 1
+        self._top = {}
+        ranges = [(0, len(self._keys))]
+        length = 1
+        while ranges:
+            large_ranges = []
+            for start, end in ranges:
+                for prefix, group_start, group_end in self._prefix_groups(start, end, length):
+                    if group_end - group_start > PRECOMPUTED_RANGE_SIZE:
+                        self._top[prefix] = self._best(
+                            set(self._ids[group_start:group_end]), MAX_AUTOCOMPLETE_LIMIT
+                        )
+                        large_ranges.append((group_start, group_end))
+            ranges = large_ranges
+            length += 1
+
+    def __len__(self):
+        return len(self._items)
+
+    def suggest(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Vrátí nejlepší návrhy začínající zadaným prefixem.
+
+        Returns:
+            List dictů {'type', 'text', 'weight'} (u názvů knih i 'isbn10')
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+
+        item_ids = self._top.get(prefix)
+        if item_ids is not None:
+            item_ids = item_ids[:limit]
+        else:
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + '\uffff', start)
+            item_ids = self._best(set(self._ids[start:end]), limit)
+
+        return [self._format(item_id) for item_id in item_ids]
+
+    def _prefix_groups(self, start, end, length):
+        # Souvislé úseky klíčů se společným prefixem délky length (kratší klíče se přeskočí)
+        position = start
+        for prefix, group in groupby(self._keys[start:end], key=lambda key: key[:length]):
+            size = sum(1 for _ in group)
+            if len(prefix) == length:
+                yield prefix, position, position + size
+            position += size
+
+    def _best(self, item_ids, limit):
+        # Nejvíce hodnocené návrhy, při shodě abecedně (viz číslování v __init__)
+        return heapq.nsmallest(limit, item_ids)
+
+    def _format(self, item_id):
+        weight, kind, text, isbn10 = self._items[item_id]
+        suggestion = {'type': kind, 'text': text, 'weight': weight}
+        if isbn10:
+            suggestion['isbn10'] = isbn10
+        return suggestion
+
+def rebuild_autocomplete_index():
+    """
+    Sestaví index našeptávače z viditelných knih a jejich žánrů a nahradí
+    jím aktuální index procesu.
+
+    Návrhy jsou názvy knih, autoři (více autorů jedné knihy se odděluje
+    středníkem) a žánry; váhou autora a žánru je součet hodnocení jejich knih.
+    Data se načtou dvěma dotazy. Volá se při startu aplikace a po každé
+    synchronizaci katalogu.
+
+    Returns:
+        AutocompleteIndex nebo None, pokud se data nepodařilo načíst
+    """
+    global _index
+    started = time.monotonic()
+    try:
+        version = _sync_version.current()
+        books = db.session.query(
+            Book.ISBN10, Book.Title, Book.Author, func.coalesce(Book.Number_of_Ratings, 0)
+        ).filter(Book.is_visible == True).all()
+        genres = db.session.query(
+            Genre.name, func.coalesce(func.sum(Book.Number_of_Ratings), 0)
+        ).join(
+            book_genres, book_genres.c.genre_id == Genre.id
+        ).join(
+            Book, Book.ISBN10 == book_genres.c.book_isbn10
+        ).filter(
+            Book.is_visible == True
+        ).group_by(Genre.name).all()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        error_logger.error('Chyba při sestavování indexu našeptávače: %s', str(e))
+        return None
+
+    suggestions = []
+    authors = {}
+    for isbn10, title, author, ratings in books:
+        suggestions.append((SUGGESTION_TITLE, title, ratings, isbn10))
+        for name in (author or '').split(';'):
+            name = name.strip()
+            if name:
+                authors[name] = authors.get(name, 0) + ratings
+    suggestions.extend((SUGGESTION_AUTHOR, name, ratings, None) for name, ratings in authors.items())
+    suggestions.extend((SUGGESTION_GENRE, name, int(ratings), None) for name, ratings in genres)
+
+    index = AutocompleteIndex(suggestions, version)
+    _index = index
+    info_logger.info('Index našeptávače sestaven: %d návrhů za %.2f s', len(index), time.monotonic() - started)
+    return index
+
+def get_autocomplete_suggestions(app, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Vrátí návrhy pro prefix z indexu procesu.
+
+    Pokud index ještě neexistuje, sestaví se hned. Pokud mezitím proběhla
+    synchronizace katalogu (i v jiném procesu), odpovídá se ze stávajícího
+    indexu a nový se sestaví na pozadí.
+
+    Args:
+        app: Instance aplikace Flask pro sestavení indexu na pozadí
+        prefix: Začátek hledaného textu
+        limit: Počet návrhů (nejvýše MAX_AUTOCOMPLETE_LIMIT)
+    """
+    index = _index
+    if index is None:
+        index = rebuild_autocomplete_index()
+        if index is None:
+            return []
+    else:
+        version = _sync_version.current()
+        if version is not None and version != index.version:
+            _start_rebuild(app)
+
+    return index.suggest(prefix, min(limit, MAX_AUTOCOMPLETE_LIMIT))
+
+def _start_rebuild(app):
+    global _rebuild_thread
+    with _rebuild_lock:
+        if _rebuild_thread is not None:
+            return
+        _rebuild_thread = threading.Thread(
+            target=_run_rebuild, args=(app,), name='autocomplete-rebuild', daemon=True
+        )
+        _rebuild_thread.start()
+
+def _run_rebuild(app):
+    global _rebuild_thread
+    try:
+        with app.app_context():
+            rebuild_autocomplete_index()
+    finally:
+        with _rebuild_lock:
+            _rebuild_thread = None
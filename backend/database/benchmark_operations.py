@@ -0,0 +1,165 @@
+# benchmark_operations.py
+import json
+import statistics
+import time
+from sqlalchemy import or_, text
+from sqlalchemy.dialects import postgresql
+from database import db
+from database.book import Book
+from database.book_operations import build_search_query, search_order_by
+
+# Filtry měřené benchmarkem vyhledávání: (popis, title, authors, isbn)
+SEARCH_BENCHMARK_CASES = (
+    ('title "dragon"', 'dragon', None, None),
+    ('title "night garden"', 'night garden', None, None),
+    ('author "dvořák"', None, 'dvořák', None),
+    ('author "hugo" + title "sea"', 'sea', 'hugo', None),
+    ('isbn "04217"', None, None, '04217'),
+    ('isbn "9780000123"', None, None, '9780000123'),
+)
+
+_TITLE_WORDS = (
+    'dragon', 'night', 'garden', 'sea', 'loneliness', 'saucer', 'winter', 'city', 'river', 'shadow',
+    'empire', 'stone', 'letters', 'history', 'secret', 'journey', 'silence', 'kingdom', 'glass',
+    'forest', 'mirror', 'island', 'war', 'memory', 'crown', 'storm', 'house', 'light', 'road', 'fire'
+)
+_FIRST_NAMES = (
+    'Antonín', 'Božena', 'Karel', 'Victor', 'Jean', 'Theodore', 'Mary', 'Émile', 'Agatha', 'Jiří',
+    'Ursula', 'Franz', 'Milan', 'Simone', 'George', 'Jane'
+)
+_LAST_NAMES = (
+    'Dvořák', 'Němcová', 'Čapek', 'Hugo', 'Molière', 'Sturgeon', 'Shelley', 'Zola', 'Christie',
+    'Weil', 'Le Guin', 'Kafka', 'Kundera', 'Beauvoir', 'Orwell', 'Austen', 'Hrabal', 'Škvorecký'
+)
+
+def benchmark_search(rows=500000, repeat=5, per_page=25):
+    """
+    Změří latenci filtrů search_books před a po zavedení trigramových indexů.
+
+    Benchmark běží v jedné transakci, která se na konci odvolá. Vytvoří
+    dočasnou tabulku book (v rámci session zastíní skutečnou tabulku) se
+    syntetickým katalogem. Výchozí stav odpovídá původnímu schématu -
+    tabulka má indexy omezení (primární klíč ISBN10, unikátní ISBN13), indexy
+    přidané pro vyhledávání se odeberou. Změří původní tvar dotazů (ILIKE),
+    poté vytvoří všechny indexy modelu Book (trigramové, fulltextový
+    a částečný pro řazení) a změří aktuální tvar dotazů z build_search_query.
+    Každé měření je count + první stránka výsledků, stejně jako v search_books.
+
+    Args:
+        rows: Počet syntetických knih
+        repeat: Počet opakování každého dotazu (výsledkem je medián)
+        per_page: Velikost stránky
+
+    Returns:
+        List dictů s popisem filtru, mediány latencí v ms, počtem nalezených
+        knih a indexy použitými v plánu po změně
+    """
+    try:
+        schema = db.session.execute(text('SELECT current_schema()')).scalar()
+        db.session.execute(text(
+            f'CREATE TEMP TABLE book (LIKE "{schema}".book INCLUDING DEFAULTS INCLUDING GENERATED '
+            'INCLUDING INDEXES) ON COMMIT DROP'
+        ))
+        _drop_search_indexes()
+        _fill_synthetic_books(rows)
+
+        results = []
+        for label, title, authors, isbn in SEARCH_BENCHMARK_CASES:
+            query = _legacy_search_query(title, authors, isbn)
+            before_ms, total = _measure(query, (Book.Title,), repeat, per_page)
+            results.append({'case': label, 'before_ms': before_ms, 'matches': total})
+
+        connection = db.session.connection()
+        for index in Book.__table__.indexes:
+            index.create(connection)
+        db.session.execute(text('ANALYZE book'))
+
+        for result, (label, title, authors, isbn) in zip(results, SEARCH_BENCHMARK_CASES):
+            query, rank = build_search_query(title, authors, isbn)
+            result['after_ms'], _ = _measure(query, search_order_by(rank), repeat, per_page)
+            result['indexes'] = _plan_indexes(query)
+
+        return results
+    finally:
+        db.session.rollback()
+
+def _drop_search_indexes():
+    # Ponechá jen indexy omezení (PK, UNIQUE) - ty mělo i původní schéma
+    index_names = db.session.execute(text("""
+        SELECT i.relname
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = 'pg_temp.book'::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    """)).scalars().all()
+    for name in index_names:
+        db.session.execute(text(f'DROP INDEX pg_temp."{name}"'))
+
+def _fill_synthetic_books(rows):
+    db.session.execute(text('SELECT setseed(0.42)'))
+    db.session.execute(text("""
+        INSERT INTO book ("ISBN10", "ISBN13", "Title", "Author", "Year_of_Publication",
+                          "Number_of_Pages", "Price", is_visible)
+        SELECT lpad(i::text, 10, '0'),
+               '978' || lpad(i::text, 10, '0'),
+               initcap(w.t[1 + floor(random() * cardinality(w.t))::int] || ' ' ||
+                       w.t[1 + floor(random() * cardinality(w.t))::int] || ' of ' ||
+                       w.t[1 + floor(random() * cardinality(w.t))::int]),
+               w.f[1 + floor(random() * cardinality(w.f))::int] || ' ' ||
+                   w.l[1 + floor(random() * cardinality(w.l))::int],
+               1900 + floor(random() * 125)::int,
+               50 + floor(random() * 900)::int,
+               round((100 + random() * 900)::numeric, 2),
+               random() < 0.95
+        FROM generate_series(1, :rows) AS i,
+             (SELECT CAST(:title_words AS text[]) AS t,
+                     CAST(:first_names AS text[]) AS f,
+                     CAST(:last_names AS text[]) AS l) AS w
+    """), {
+        'rows': rows,
+        'title_words': list(_TITLE_WORDS),
+        'first_names': list(_FIRST_NAMES),
+        'last_names': list(_LAST_NAMES)
+    })
+    db.session.execute(text('ANALYZE book'))
+
+def _legacy_search_query(title, authors, isbn):
+    # Tvar dotazu před zavedením trigramových indexů
+    query = Book.query.filter_by(is_visible=True)
+    if title:
+        query = query.filter(Book.Title.ilike(f'%{title}%'))
+    if authors:
+        for author in [author.strip() for author in authors.split(';') if author.strip()]:
+            query = query.filter(Book.Author.ilike(f'%{author}%'))
+    if isbn:
+        query = query.filter(or_(Book.ISBN10.ilike(f'%{isbn}%'), Book.ISBN13.ilike(f'%{isbn}%')))
+    return query
+
+def _measure(query, order_by, repeat, per_page):
+    timings = []
+    total = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = query.count()
+        query.order_by(*order_by).limit(per_page).all()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    return round(statistics.median(timings), 2), total
+
+def _plan_indexes(query):
+    sql = str(query.statement.compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={'literal_binds': True}
+    ))
+    plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    indexes = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Index Name') and node['Index Name'] not in indexes:
+            indexes.append(node['Index Name'])
+        nodes.extend(node.get('Plans', []))
+    return indexes
@@ -1,4 +1,14 @@
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from . import db
+from .schema import BOOK_SEARCH_CONFIG
+
+# Váhy: název (A) > autor (B) > popis (C)
+BOOK_SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{BOOK_SEARCH_CONFIG}'::regconfig, coalesce(\"Title\", '')), 'A') || "
+    f"setweight(to_tsvector('{BOOK_SEARCH_CONFIG}'::regconfig, coalesce(\"Author\", '')), 'B') || "
+    f"setweight(to_tsvector('{BOOK_SEARCH_CONFIG}'::regconfig, coalesce(\"Description\", '')), 'C')"
+)
 
 class Book(db.Model):
     """
@@ -20,6 +30,17 @@ class Book(db.Model):
         Number_of_Ratings (int, optional): Total number of ratings received
         Price (float, optional): Current price of the book
         is_visible (bool): Indicates whether the book is visible in the catalog (default: True)
+        content_hash (str, optional): SHA-256 fingerprint of the last synced CDB record
+                                      including its categories, used to skip unchanged books
+        search_vector (tsvector): Generated full-text vector over Title, Author and Description
+                                  (weighted A, B, C), GIN indexed and loaded only on access
+
+    Indexes:
+        Trigram GIN indexes (pg_trgm) on lower(Title), lower(Author), ISBN10 and ISBN13
+        serve the partial-match filters of search_books, which compare
+        lower(column) LIKE lower('%term%') so the expression indexes apply.
+        A partial (Title, ISBN10) index over visible books serves the catalog
+        ordering and the keyset (cursor) pagination of /api/books.
 
     Relationships:
         - genres: Dynamic relationship with Genre model through book_genres association table
@@ -46,6 +67,22 @@ class Book(db.Model):
     Number_of_Ratings = db.Column(db.Integer)
     Price = db.Column(db.Float)
     is_visible = db.Column(db.Boolean, default=True)
+    content_hash = db.Column(db.String(64))
+    search_vector = deferred(db.Column(TSVECTOR, db.Computed(BOOK_SEARCH_VECTOR, persisted=True)))
+
+    __table_args__ = (
+        db.Index('ix_book_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_book_visible_title_isbn10', 'Title', 'ISBN10',
+                 postgresql_where=db.text('is_visible')),
+        db.Index('ix_book_title_trgm', db.func.lower(Title).label('title_lower'),
+                 postgresql_using='gin', postgresql_ops={'title_lower': 'gin_trgm_ops'}),
+        db.Index('ix_book_author_trgm', db.func.lower(Author).label('author_lower'),
+                 postgresql_using='gin', postgresql_ops={'author_lower': 'gin_trgm_ops'}),
+        db.Index('ix_book_isbn10_trgm', 'ISBN10',
+                 postgresql_using='gin', postgresql_ops={'ISBN10': 'gin_trgm_ops'}),
+        db.Index('ix_book_isbn13_trgm', 'ISBN13',
+                 postgresql_using='gin', postgresql_ops={'ISBN13': 'gin_trgm_ops'}),
+    )
 
     # Vztah k žánrům
     genres = db.relationship('Genre',
@@ -1,236 +1,630 @@
-from sqlalchemy import or_
+import base64
+import binascii
+import json
+import logging
+from sqlalchemy import REAL, and_, cast, func, or_, tuple_
+from sqlalchemy.orm import load_only
 from database.genre import Genre
-from database.genre_operations import filter_books_by_genres, update_book_genres
+from database.genre_facet import GenreFacet
+from database.genre_operations import filter_books_by_genres, get_genre_names_by_isbn
 from database.book import db, Book, book_genres
+from database.schema import BOOK_SEARCH_CONFIG
 from database.user import favorite_books
-from database.audit import AuditEventType
-from database.audit_operations import create_audit_log
+from database.cart_item import CartItem
+from database.isbn_operations import find_book_by_isbn, find_books_by_isbns, normalize_isbn
+from database.sync_operations import CatalogSync
+from database.autocomplete_operations import rebuild_autocomplete_index
+from database.cache_operations import LRUCache, CacheVersionWatcher, CATALOG_CACHE_VERSION
+
 from sqlalchemy.exc import SQLAlchemyError
 
-def get_favorite_books(user_id, page=1, per_page=25):
+STREAM_COMMIT_EVERY = 5
+
+error_logger = logging.getLogger('error_logger')
+
+# Procesová cache katalogu - mezi synchronizacemi z CDB se katalog téměř nemění.
+# Zneplatňuje se verzí katalogu v databázi (sdílenou mezi workery gunicornu).
+CATALOG_CACHE_TTL = 300  # sekund
+BOOK_CACHE_SIZE = 5000
+SEARCH_CACHE_SIZE = 1000
+
+# Nejvyšší počet ISBN v jednom hromadném dotazu (get_books_by_isbns)
+MAX_BATCH_ISBNS = 500
+
+_book_cache = LRUCache(BOOK_CACHE_SIZE, CATALOG_CACHE_TTL)
+_search_cache = LRUCache(SEARCH_CACHE_SIZE, CATALOG_CACHE_TTL)
+_genre_list_cache = LRUCache(1, CATALOG_CACHE_TTL)
+_catalog_version = CacheVersionWatcher(
+    CATALOG_CACHE_VERSION, (_book_cache, _search_cache, _genre_list_cache)
+)
+
+# Režimy celkového počtu výsledků: přesný (okenní funkcí ve stejném dotazu),
+# odhad z plánu PostgreSQL, nebo bez počtu (nekonečné scrollování)
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+# Pole knihy v odpovědích API (v tomto pořadí) a pojmenované projekce pro parametr fields
+BOOK_FIELDS = (
+    'ISBN10', 'ISBN13', 'Title', 'Author', 'Genres', 'Cover_Image', 'Description',
+    'Year_of_Publication', 'Number_of_Pages', 'Average_Rating', 'Number_of_Ratings',
+    'Price', 'is_visible'
+)
+BOOK_DETAIL_FIELDS = tuple(field for field in BOOK_FIELDS if field != 'is_visible')
+FIELD_PROJECTIONS = {
+    'card': ('ISBN10', 'ISBN13', 'Title', 'Author', 'Cover_Image', 'Price')  # dlaždice katalogu
+}
+
+def get_favorite_books(user_id, page=1, per_page=25, count=COUNT_EXACT, fields=None):
+    """
+    Získá stránku oblíbených knih uživatele.
+
+    Args:
+        count: Režim celkového počtu (viz COUNT_MODES)
+        fields: Pole knihy v odpovědi (viz parse_fields), None pro všechna
+
+    Returns:
+        tuple: (books_data, total) - total je None v režimu 'none'
+
+    Raises:
+        ValueError: Pokud režim počtu není platný
+    """
+    _check_count_mode(count)
     try:
         base_query = db.session.query(Book).join(
             favorite_books,
             Book.ISBN10 == favorite_books.c.book_isbn10
         ).filter(
             favorite_books.c.user_id == user_id
-        )
+        ).options(*book_load_options(fields))
 
-        total_books = base_query.count()
-        books = base_query.order_by(Book.Title).offset((page - 1) * per_page).limit(per_page).all()
+        rows, total_books = _fetch_page(
+            base_query, (Book.Title, Book.ISBN10), per_page, count, offset=(page - 1) * per_page
+        )
+        books = [row[0] for row in rows]
 
-        books_data = _format_books_data(books)
+        books_data = format_books_data(books, fields)
         return books_data, total_books
     except SQLAlchemyError as e:
         print(f"Error getting favorite books: {str(e)}")
         return [], 0
 
-def search_books(title=None, authors=None, isbn=None, genres=None, page=1, per_page=25):
+def get_cart_books(user_id, page=1, per_page=25, fields=None):
+    """
+    Získá stránku viditelných knih v košíku uživatele, nejnověji přidané první.
+
+    Stránka i celkový počet se načtou jedním dotazem (okenní funkcí) přes
+    index (user_id, added_at) tabulky cart_item, žánry stránky dalším
+    dotazem - cena nezávisí na velikosti košíku.
+
+    Args:
+        fields: Pole knihy v odpovědi (viz parse_fields), None pro všechna
+
+    Returns:
+        tuple: (books_data, total)
+
+    Raises:
+        SQLAlchemyError: Při chybě databáze
+    """
+    base_query = db.session.query(Book).join(
+        CartItem,
+        Book.ISBN10 == CartItem.book_isbn10
+    ).filter(
+        CartItem.user_id == user_id,
+        Book.is_visible == True
+    ).options(*book_load_options(fields))
+
+    rows, total_books = _fetch_page(
+        base_query, (CartItem.added_at.desc(), Book.ISBN10), per_page, COUNT_EXACT,
+        offset=(page - 1) * per_page
+    )
+    books = [row[0] for row in rows]
+
+    return format_books_data(books, fields), total_books
+
+def search_books(title=None, authors=None, isbn=None, genres=None, page=1, per_page=25, q=None, cursor=None,
+                 count=COUNT_EXACT, fields=None):
+    """
+    Vyhledá viditelné knihy a vrátí jednu stránku výsledků.
+
+    Stránkovat lze offsetem (page) nebo kurzorem. Kurzor je neprůhledný token
+    s klíčem řazení poslední vrácené knihy; další stránka se pak čte od tohoto
+    klíče (keyset pagination) a cena dotazu nezávisí na hloubce stránky.
+    Kurzor na další stránku se vrací v obou režimech.
+
+    Přesný celkový počet se při stránkování offsetem počítá okenní funkcí
+    count(*) OVER () ve stejném dotazu jako stránka. Při stránkování kurzorem
+    by okno zahrnulo jen knihy za kurzorem, počet se proto zjistí zvlášť.
+
+    Výsledky se ukládají do procesové cache do další změny verze katalogu.
+
+    Args:
+        page: Číslo stránky, ignoruje se při zadaném kurzoru
+        cursor: Token next_cursor z předchozí odpovědi
+        count: Režim celkového počtu (viz COUNT_MODES)
+        fields: Pole knihy v odpovědi (viz parse_fields), None pro všechna. Z databáze
+                se načtou jen sloupce těchto polí.
+
+    Returns:
+        tuple: (books_data, total, next_cursor) - next_cursor je None na poslední
+               stránce, total je None v režimu 'none'
+
+    Raises:
+        ValueError: Pokud kurzor nebo režim počtu není platný
+        SQLAlchemyError: Při chybě databáze (zaloguje se a předá volajícímu)
+    """
+    _check_count_mode(count)
+    key = (title, authors, isbn, genres, page, per_page, q, cursor, count, fields)
+    version = _catalog_version.current()
+    hit, result = _catalog_version.get(_search_cache, key, version)
+    if hit:
+        return result
+
     try:
-        query = Book.query.filter_by(is_visible=True)
-
-        if title:
-            query = query.filter(Book.Title.ilike(f'%{title}%'))
-
-        if authors:
-            author_terms = [author.strip() for author in authors.split(';') if author.strip()]
-            for author in author_terms:
-                query = query.filter(Book.Author.ilike(f'%{author}%'))
-
-        if isbn:
-            query = query.filter(
-                or_(
-                    Book.ISBN10.ilike(f'%{isbn}%'),
-                    Book.ISBN13.ilike(f'%{isbn}%')
-                )
+        result = _search_books(title, authors, isbn, genres, page, per_page, q, cursor, count, fields)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        error_logger.error('Chyba při vyhledávání knih: %s', str(e))
+        raise
+
+    _catalog_version.store(_search_cache, key, result, version)
+    return result
+
+def _search_books(title, authors, isbn, genres, page, per_page, q, cursor, count, fields):
+    query, rank = build_search_query(title, authors, isbn, genres, q)
+    query = query.options(*book_load_options(fields))
+    ranked = rank is not None
+    columns = (rank,) if ranked else ()
+
+    total = None
+    page_count = count
+    offset = (page - 1) * per_page
+    if cursor:
+        seek = _seek_after(rank, _decode_cursor(cursor, ranked))
+        if count == COUNT_EXACT:
+            total = query.count()
+        elif count == COUNT_ESTIMATE:
+            total = estimate_row_count(query)
+        query = query.filter(seek)
+        page_count, offset = COUNT_NONE, 0
+
+    rows, page_total = _fetch_page(query, search_order_by(rank), per_page + 1, page_count, offset, columns)
+    if page_count != COUNT_NONE:
+        total = page_total
+
+    next_cursor = _encode_cursor(*rows[per_page - 1]) if len(rows) > per_page else None
+    books = [row[0] for row in rows[:per_page]]
+
+    books_data = format_books_data(books, fields)
+    return books_data, total, next_cursor
+
+def estimate_row_count(query):
+    """
+    Odhadne počet řádků dotazu z plánu PostgreSQL (EXPLAIN) bez jeho provedení.
+
+    Returns:
+        int: Počet řádků odhadnutý plánovačem
+    """
+    # IN parametry (např. filtr žánrů) se při kompilaci musí rozepsat, jinak
+    # by v SQL zůstaly zástupné symboly __[POSTCOMPILE_...]
+    statement = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}
+    )
+    plan = db.session.connection().exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {statement}', statement.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def _check_count_mode(count):
+    if count not in COUNT_MODES:
+        raise ValueError(f"Neplatný režim počtu, povolené hodnoty: {', '.join(COUNT_MODES)}")
+
+def _fetch_page(query, order_by, limit, count, offset=0, columns=()):
+    # Vrací řádky jako n-tice (kniha, *columns) a celkový počet podle režimu
+    total = estimate_row_count(query) if count == COUNT_ESTIMATE else None
+    windowed = count == COUNT_EXACT
+
+    page_query = query.add_columns(*columns) if columns else query
+    if windowed:
+        page_query = page_query.add_columns(func.count().over().label('total_count'))
+
+    rows = page_query.order_by(*order_by).offset(offset).limit(limit).all()
+    rows = [tuple(row) if columns or windowed else (row,) for row in rows]
+
+    if windowed:
+        # Stránka za koncem výsledků neobsahuje žádný řádek s počtem
+        total = rows[0][-1] if rows else (query.count() if offset else 0)
+        rows = [row[:-1] for row in rows]
+    return rows, total
+
+def build_search_query(title=None, authors=None, isbn=None, genres=None, q=None):
+    """
+    Sestaví dotaz na viditelné knihy podle vyhledávacích kritérií.
+
+    Filtry podle názvu a autora porovnávají lower(sloupec) LIKE lower('%výraz%'),
+    aby PostgreSQL mohl použít trigramové indexy nad lower("Title")
+    a lower("Author"). ISBN se porovnává bez pomlček a mezer, velkými písmeny
+    (kontrolní znak X), přímo nad trigramovými indexy obou sloupců.
+    Indexy se uplatní u výrazů o délce alespoň 3 znaky.
+
+    Returns:
+        tuple: (query, rank) - dotaz bez řazení a výraz relevance fulltextu
+               (None bez parametru q), řazení viz search_order_by
+    """
+    query = Book.query.filter_by(is_visible=True)
+    rank = None
+
+    if q and q.strip():
+        # Fulltext nad názvem, autorem a popisem, řazeno podle relevance
+        ts_query = func.websearch_to_tsquery(BOOK_SEARCH_CONFIG, q)
+        query = query.filter(Book.search_vector.bool_op('@@')(ts_query))
+        rank = func.ts_rank_cd(Book.search_vector, ts_query)
+
+    if title:
+        query = query.filter(func.lower(Book.Title).like(func.lower(f'%{title}%')))
+
+    if authors:
+        author_terms = [author.strip() for author in authors.split(';') if author.strip()]
+        for author in author_terms:
+            query = query.filter(func.lower(Book.Author).like(func.lower(f'%{author}%')))
+
+    if isbn:
+        isbn_term = normalize_isbn(isbn)
+        query = query.filter(
+            or_(
+                Book.ISBN10.like(f'%{isbn_term}%'),
+                Book.ISBN13.like(f'%{isbn_term}%')
             )
+        )
 
-        if genres:
-            query = filter_books_by_genres(query, genres)
+    if genres:
+        query = filter_books_by_genres(query, genres)
 
-        total = query.count()
-        books = query.order_by(Book.Title).offset((page - 1) * per_page).limit(per_page).all()
+    return query, rank
 
-        books_data = _format_books_data(books)
-        return books_data, total
-    except SQLAlchemyError as e:
-        print(f"Error searching books: {str(e)}")
-        return [], 0
+def search_order_by(rank=None):
+    """
+    Vrátí řazení výsledků vyhledávání - podle relevance (je-li zadána), názvu
+    a ISBN10, které řazení jednoznačně určuje a slouží jako klíč kurzoru.
+    """
+    if rank is not None:
+        return rank.desc(), Book.Title, Book.ISBN10
+    return Book.Title, Book.ISBN10
+
+def _seek_after(rank, key):
+    title_key = tuple_(Book.Title, Book.ISBN10) > tuple_(key[-2], key[-1])
+    if rank is None:
+        return title_key
+    # ts_rank_cd vrací real, porovnání s hodnotou z kurzoru musí být ve stejném typu
+    rank_key = cast(key[0], REAL)
+    return or_(rank < rank_key, and_(rank == rank_key, title_key))
+
+def _encode_cursor(book, rank_value=None):
+    key = [book.Title, book.ISBN10]
+    if rank_value is not None:
+        key.insert(0, rank_value)
+    payload = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor, ranked):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(payload.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Neplatný kurzor')
+
+    if not isinstance(key, list) or len(key) != (3 if ranked else 2) \
+            or not all(isinstance(value, str) for value in key[-2:]) \
+            or (ranked and not isinstance(key[0], (int, float))):
+        raise ValueError('Neplatný kurzor')
+    return key
 
 def get_book_by_isbn(isbn, user_id=None):
+    """
+    Získá detail viditelné knihy podle ISBN10 nebo ISBN13.
+
+    Data knihy se ukládají do procesové cache pod oběma ISBN (i informace,
+    že kniha neexistuje). Příznak oblíbenosti se zjišťuje vždy zvlášť.
+
+    Returns:
+        Dict s daty knihy nebo None
+    """
     try:
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).filter_by(is_visible=True).first()
+        version = _catalog_version.current()
+        hit, book_data = _catalog_version.get(_book_cache, isbn, version)
+        if not hit:
+            book = find_book_by_isbn(isbn)
+            if book and not book.is_visible:
+                book = None
 
-        if not book:
+            book_data = _format_book_details([book])[0] if book else None
+            keys = {isbn, book.ISBN10, book.ISBN13} if book else {isbn}
+            for key in keys:
+                _catalog_version.store(_book_cache, key, book_data, version)
+
+        if not book_data:
             return None
 
         is_favorite = False
         if user_id:
             favorite = db.session.query(favorite_books).filter_by(
                 user_id=user_id,
-                book_isbn10=book.ISBN10
+                book_isbn10=book_data['ISBN10']
             ).first()
             is_favorite = favorite is not None
 
-        return _format_book_data(book, is_favorite)
+        return dict(book_data, is_favorite=is_favorite)
     except SQLAlchemyError as e:
         print(f"Error getting book by ISBN: {str(e)}")
         return None
 
+def get_books_by_isbns(isbns, user_id=None):
+    """
+    Získá detaily viditelných knih pro seznam ISBN10 nebo ISBN13.
+
+    Odpovídá volání get_book_by_isbn pro každé ISBN, ale počet dotazů je
+    konstantní: knihy, které nejsou v procesové cache, se načtou jedním
+    dotazem, jejich žánry druhým a příznaky oblíbenosti třetím.
+
+    Args:
+        isbns: List ISBN10 nebo ISBN13 (nejvýše MAX_BATCH_ISBNS různých)
+        user_id: ID uživatele pro příznak is_favorite
+
+    Returns:
+        Dict {požadované ISBN v původním tvaru (bez normalizace): data knihy nebo None}
+
+    Raises:
+        ValueError: Pokud je zadáno příliš mnoho ISBN
+        SQLAlchemyError: Pokud dotaz do databáze selže
+    """
+    requested = list(dict.fromkeys(isbns))
+    if len(requested) > MAX_BATCH_ISBNS:
+        raise ValueError(f'Najednou lze načíst nejvýše {MAX_BATCH_ISBNS} ISBN')
+
+    version = _catalog_version.current()
+    results = {}
+    missing = []
+    for isbn in requested:
+        hit, book_data = _catalog_version.get(_book_cache, isbn, version)
+        if hit:
+            results[isbn] = book_data
+        else:
+            missing.append(isbn)
+
+    if missing:
+        found = {isbn: book for isbn, book in find_books_by_isbns(missing).items() if book.is_visible}
+        books = list({book.ISBN10: book for book in found.values()}.values())
+
+        by_isbn10 = {}
+        for book, book_data in zip(books, _format_book_details(books)):
+            by_isbn10[book.ISBN10] = book_data
+            for key in (book.ISBN10, book.ISBN13):
+                _catalog_version.store(_book_cache, key, book_data, version)
+        for isbn in missing:
+            book = found.get(isbn)
+            results[isbn] = by_isbn10[book.ISBN10] if book else None
+            _catalog_version.store(_book_cache, isbn, results[isbn], version)
+
+    favorite_isbns = set()
+    found_isbn10s = {book_data['ISBN10'] for book_data in results.values() if book_data}
+    if user_id and found_isbn10s:
+        favorite_isbns = set(db.session.scalars(
+            db.select(favorite_books.c.book_isbn10).where(
+                favorite_books.c.user_id == user_id,
+                favorite_books.c.book_isbn10.in_(found_isbn10s)
+            )
+        ))
+
+    # Výsledky v pořadí požadavku
+    return {
+        isbn: dict(results[isbn], is_favorite=results[isbn]['ISBN10'] in favorite_isbns) if results[isbn] else None
+        for isbn in requested
+    }
+
 def fetch_and_update_books(books_data):
+    sync = CatalogSync()
     try:
-        previously_visible_books = {book.ISBN10 for book in Book.query.filter_by(is_visible=True).all()}
-        new_visible_isbns = {book['isbn10'] for book in books_data if book.get('isbn10')}
-        newly_added_books = set()
-        
-        updated_books = 0
-        new_books = 0
-        
-        Book.query.update({Book.is_visible: False}, synchronize_session=False)
-        
-        for book in books_data:
-            isbn10 = book.get('isbn10')
-            if not isbn10:
-                continue
-
-            existing_book = Book.query.get(isbn10)
-            categories = book.get('categories', '')  # Získáme žánry z dat knihy
-
-            if existing_book:
-                _update_existing_book(existing_book, book)
-                update_book_genres(existing_book, categories)  # Aktualizujeme žánry
-                updated_books += 1
-            else:
-                new_book = _create_new_book(book)
-                update_book_genres(new_book, categories)  # Nastavíme žánry
-                db.session.add(new_book)
-                new_books += 1
-                newly_added_books.add(isbn10)
-
-                # Záznam o přidání nové knihy - už bez book_title
-                create_audit_log(
-                    event_type=AuditEventType.BOOK_ADD,
-                    username="CDB_SYSTEM",
-                    book_isbn=isbn10,
-                    additional_data={
-                        "author": new_book.Author
-                    }
-                )
-
-        _create_audit_logs(previously_visible_books, new_visible_isbns, newly_added_books)
-
-        db.session.commit()
-        return updated_books, new_books
+        sync.start()
+        sync.add_records(books_data)
+        result = sync.finish()
+        # Ostatní procesy přestaví index podle verze synchronizace
+        rebuild_autocomplete_index()
+        return result
 
-    except SQLAlchemyError as e:
-        db.session.rollback()
+    except Exception as e:
+        # abort() uvolní i zámek synchronizace
+        sync.abort()
         raise e
 
-def _format_books_data(books):
+def stream_and_update_books(records, commit_every=STREAM_COMMIT_EVERY):
+    """
+    Synchronizuje katalog z postupně čteného zdroje záznamů.
+
+    Záznamy se zapisují po dávkách a průběžně commitují, takže paměťová
+    náročnost nezávisí na velikosti katalogu. Při chybě zůstanou dříve
+    potvrzené dávky zapsané, skrytí chybějících knih proběhne až po
+    úspěšném zpracování všech záznamů.
+
+    Args:
+        records: Iterable slovníků ve formátu CDB (např. z iter_ndjson_records)
+        commit_every: Po kolika dávkách se commituje
+
+    Returns:
+        Dict s počítadly průběhu synchronizace (viz CatalogSync.progress)
+    """
+    sync = CatalogSync(commit_every=commit_every)
+    try:
+        sync.start()
+        sync.add_records(records)
+        if not sync.processed_records:
+            # Prázdný proud nesmí skrýt celý katalog
+            sync.abort()
+            return sync.progress()
+        sync.finish()
+        rebuild_autocomplete_index()
+        return sync.progress()
+
+    except Exception as e:
+        sync.abort()
+        raise e
+
+def format_books_data(books, fields=None):
+    """
+    Naformátuje stránku knih pro API.
+
+    Žánry všech knih se načtou jedním dotazem (get_genre_names_by_isbn),
+    počet dotazů tedy nezávisí na velikosti stránky. Při projekci se čtou
+    jen zvolená pole, knihy tedy stačí načíst s book_load_options(fields).
+
+    Args:
+        books: List instancí Book
+        fields: Pole v odpovědi (viz parse_fields), None pro všechna
+
+    Returns:
+        List dictů s daty knih
+    """
+    fields = fields or BOOK_FIELDS
+    genre_names = get_genre_names_by_isbn(book.ISBN10 for book in books) if 'Genres' in fields else {}
     return [{
-        'ISBN10': book.ISBN10,
-        'ISBN13': book.ISBN13,
-        'Title': book.Title,
-        'Author': book.Author,
-        'Genres': [genre.name for genre in book.genres],  # Seznam názvů žánrů
-        'Cover_Image': book.Cover_Image,
-        'Description': book.Description,
-        'Year_of_Publication': book.Year_of_Publication,
-        'Number_of_Pages': book.Number_of_Pages,
-        'Average_Rating': book.Average_Rating,
-        'Number_of_Ratings': book.Number_of_Ratings,
-        'Price': book.Price,
-        'is_visible': book.is_visible
+        # Genres je seznam názvů žánrů, ostatní pole jsou sloupce knihy
+        field: genre_names.get(book.ISBN10, []) if field == 'Genres' else getattr(book, field)
+        for field in fields
     } for book in books]
 
-def _format_book_data(book, is_favorite=False):
-    return {
-        'ISBN10': book.ISBN10,
-        'ISBN13': book.ISBN13,
-        'Title': book.Title,
-        'Author': book.Author,
-        'Genres': [genre.name for genre in book.genres],  # Seznam názvů žánrů
-        'Cover_Image': book.Cover_Image,
-        'Description': book.Description,
-        'Year_of_Publication': book.Year_of_Publication,
-        'Number_of_Pages': book.Number_of_Pages,
-        'Average_Rating': book.Average_Rating,
-        'Number_of_Ratings': book.Number_of_Ratings,
-        'Price': book.Price,
-        'is_favorite': is_favorite
-    }
+def parse_fields(value):
+    """
+    Zpracuje parametr fields seznamových endpointů knih.
 
-def _update_existing_book(book, data):
-    book.is_visible = data.get('price', 0) > 0
-    book.ISBN13 = data.get('isbn13')
-    book.Title = data.get('title')
-    book.Author = data.get('authors') if isinstance(data.get('authors'), str) else '; '.join(data.get('authors', []))
-    book.Cover_Image = data.get('thumbnail')
-    book.Description = data.get('description')
-    book.Year_of_Publication = data.get('published_year')
-    book.Number_of_Pages = data.get('num_pages')
-    book.Average_Rating = data.get('average_rating')
-    book.Number_of_Ratings = data.get('ratings_count')
-    book.Price = data.get('price')
-
-def _create_new_book(data):
-    return Book(
-        ISBN10=data.get('isbn10'),
-        ISBN13=data.get('isbn13'),
-        Title=data.get('title'),
-        Author=data.get('authors') if isinstance(data.get('authors'), str) else '; '.join(data.get('authors', [])),
-        Cover_Image=data.get('thumbnail'),
-        Description=data.get('description'),
-        Year_of_Publication=data.get('published_year'),
-        Number_of_Pages=data.get('num_pages'),
-        Average_Rating=data.get('average_rating'),
-        Number_of_Ratings=data.get('ratings_count'),
-        Price=data.get('price'),
-        is_visible=data.get('price', 0) > 0
-        # Žánry se nastavují zvlášť pomocí update_book_genres
-    )
+    Hodnota je čárkou oddělený seznam polí (BOOK_FIELDS) nebo názvů projekcí
+    (FIELD_PROJECTIONS, např. 'card'). ISBN10 je v odpovědi vždy.
+
+    Returns:
+        tuple|None: Pole v pořadí BOOK_FIELDS, None pokud parametr není zadán (všechna pole)
 
+    Raises:
+        ValueError: Pokud hodnota obsahuje neznámé pole nebo projekci
+    """
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    if not names:
+        return None
 
-def _create_audit_logs(previously_visible_books, new_visible_isbns, newly_added_books):
-    # Zaznamenání skrytých knih
-    for isbn in previously_visible_books:
-        if isbn not in new_visible_isbns:
-            create_audit_log(
-                event_type=AuditEventType.BOOK_HIDE,
-                username="CDB_SYSTEM",
-                book_isbn=isbn
+    selected = {'ISBN10'}
+    for name in names:
+        if name in FIELD_PROJECTIONS:
+            selected.update(FIELD_PROJECTIONS[name])
+        elif name in BOOK_FIELDS:
+            selected.add(name)
+        else:
+            raise ValueError(
+                f"Neznámé pole '{name}', povolené hodnoty: {', '.join((*FIELD_PROJECTIONS, *BOOK_FIELDS))}"
             )
+    return tuple(field for field in BOOK_FIELDS if field in selected)
 
-    for isbn in new_visible_isbns:
-        if isbn not in previously_visible_books and isbn not in newly_added_books:
-            book = Book.query.get(isbn)
-            if book:
-                create_audit_log(
-                    event_type=AuditEventType.BOOK_SHOW,
-                    username="CDB_SYSTEM",
-                    book_isbn=isbn
-                )
+def book_load_options(fields=None):
+    """
+    Vrátí volby dotazu, které z tabulky book načtou jen sloupce zvolených polí.
+
+    ISBN10 a Title se načítají vždy - jsou klíčem řazení a kurzoru stránkování.
+    Ostatní sloupce (zejména Description) zůstanou odložené; přístup k nim
+    by vyvolal samostatný dotaz pro každou knihu.
 
-def get_all_unique_genres():
+    Returns:
+        tuple: Volby pro Query.options(), prázdné pokud fields není zadáno
     """
-    Získá všechny unikátní žánry z aktivních knih.
-    
+    if not fields:
+        return ()
+    columns = {'ISBN10', 'Title'}.union(field for field in fields if field != 'Genres')
+    return (load_only(*(getattr(Book, field) for field in BOOK_FIELDS if field in columns)),)
+
+def _format_book_details(books):
+    # Detail knihy (get_book_by_isbn) - bez is_visible, s příznakem is_favorite
+    return [
+        dict(book_data, is_favorite=False)
+        for book_data in format_books_data(books, BOOK_DETAIL_FIELDS)
+    ]
+
+def get_genre_facets():
+    """
+    Získá žánry s počty viditelných knih z předpočítané tabulky genre_facet.
+
+    Tabulka se přepočítává na konci každé synchronizace katalogu, čtení tedy
+    nevyžaduje spojení žánrů s celým katalogem. Seznam se ukládá do procesové
+    cache do další změny verze katalogu.
+
     Returns:
-        List[str]: Seřazený seznam názvů žánrů
+        List dictů {'name': název žánru, 'count': počet knih} seřazený podle názvu
     """
+    version = _catalog_version.current()
+    hit, facets = _catalog_version.get(_genre_list_cache, 'all', version)
+    if hit:
+        return facets
+
     try:
-        # Získáme všechny žánry, které mají alespoň jednu viditelnou knihu
-        active_genres = Genre.query\
-            .join(book_genres)\
-            .join(Book)\
-            .filter(Book.is_visible == True)\
-            .distinct()\
-            .order_by(Genre.name)\
+        rows = db.session.query(GenreFacet.name, GenreFacet.book_count)\
+            .filter(GenreFacet.book_count > 0)\
+            .order_by(GenreFacet.name)\
             .all()
 
-        return [genre.name for genre in active_genres]
+        facets = [{'name': name, 'count': book_count} for name, book_count in rows]
+        _catalog_version.store(_genre_list_cache, 'all', facets, version)
+        return facets
     except SQLAlchemyError as e:
-        print(f"Error getting unique genres: {str(e)}")
+        db.session.rollback()
+        error_logger.error('Chyba při získávání počtů knih podle žánrů: %s', str(e))
         return []
+
+def get_search_genre_facets(title=None, authors=None, isbn=None, genres=None, q=None):
+    """
+    Spočítá knihy odpovídající vyhledávacím kritériím podle žánrů.
+
+    Kritéria mají stejný význam jako v search_books; počty se zjistí jedním
+    agregačním dotazem nad výsledkem vyhledávání. Výsledek se ukládá do
+    procesové cache do další změny verze katalogu.
+
+    Returns:
+        List dictů {'name': název žánru, 'count': počet knih} seřazený
+        sestupně podle počtu a poté podle názvu
+    """
+    key = ('genre_facets', title, authors, isbn, genres, q)
+    version = _catalog_version.current()
+    hit, facets = _catalog_version.get(_search_cache, key, version)
+    if hit:
+        return facets
+
+    query, _ = build_search_query(title, authors, isbn, genres, q)
+    matching = query.with_entities(Book.ISBN10).subquery()
+    book_count = func.count().label('book_count')
+    rows = db.session.query(Genre.name, book_count)\
+        .join(book_genres, book_genres.c.genre_id == Genre.id)\
+        .join(matching, matching.c.ISBN10 == book_genres.c.book_isbn10)\
+        .group_by(Genre.id, Genre.name)\
+        .order_by(book_count.desc(), Genre.name)\
+        .all()
+
+    facets = [{'name': name, 'count': count} for name, count in rows]
+    _catalog_version.store(_search_cache, key, facets, version)
+    return facets
+
+def get_catalog_version():
+    """
+    Získá verzi katalogu, se kterou pracuje cache tohoto procesu.
+
+    Returns:
+        int|None: Verze katalogu, None pokud ji nelze zjistit
+    """
+    return _catalog_version.current()
+
+def get_catalog_cache_stats():
+    """
+    Vrátí statistiky procesové cache katalogu (zásahy, výpadky, velikost)
+    a verzi katalogu, se kterou cache pracuje.
+    """
+    return {
+        'catalog': _catalog_version.stats(),
+        'books': _book_cache.stats(),
+        'searches': _search_cache.stats(),
+        'genres': _genre_list_cache.stats()
+    }
@@ -0,0 +1,284 @@
+# bulk_load_operations.py
+import csv
+import gzip
+import io
+from datetime import datetime
+from sqlalchemy import and_, column, func, literal, select, table, text
+from database import db
+from database.audit import AuditLog, AuditEventType
+from database.sync import CatalogSyncIsbn
+from database.sync_operations import CatalogSync, SYNC_USERNAME
+from database.isbn_operations import refresh_isbn_aliases
+
+# Sloupce, které loader zná (názvy odpovídají klíčům záznamů z CDB)
+CSV_COLUMNS = (
+    'isbn13', 'isbn10', 'title', 'subtitle', 'authors', 'categories', 'thumbnail',
+    'description', 'published_year', 'average_rating', 'num_pages', 'ratings_count', 'price'
+)
+# Pořadí sloupců snímku bez hlavičky (data/data_mock.csv)
+DEFAULT_CSV_COLUMNS = CSV_COLUMNS[:-1]
+
+_INT_PATTERN = r'^\s*-?\d+\s*$'
+_FLOAT_PATTERN = r'^\s*-?\d+(\.\d+)?([eE][-+]?\d+)?\s*$'
+
+def bulk_load_csv(path, columns=None, header=False, encoding='UTF8', delimiter=','):
+    """
+    Hromadně načte CSV snímek katalogu (volitelně komprimovaný gzipem).
+
+    Soubor se nahraje příkazem COPY do dočasných tabulek a odtud se sloučí
+    do tabulek book, genre a book_genres několika množinovými dotazy.
+    Viditelnost, žánry i auditní záznamy mají stejnou sémantiku jako
+    fetch_and_update_books - knihy chybějící ve snímku se skryjí.
+    Celé načtení probíhá v jedné transakci.
+
+    Args:
+        path: Cesta k souboru .csv nebo .csv.gz
+        columns: Pořadí sloupců souboru (výchozí DEFAULT_CSV_COLUMNS)
+        header: Zda první řádek obsahuje názvy sloupců (pak se použijí ony)
+        encoding: Kódování souboru ve tvaru pro PostgreSQL (např. UTF8, LATIN1)
+        delimiter: Oddělovač sloupců
+
+    Returns:
+        Dict s počty zpracovaných, neplatných, aktualizovaných, nových
+        a nezměněných záznamů
+    """
+    if header:
+        columns = _read_header(path, encoding, delimiter)
+    columns = [name.strip().lower() for name in (columns or DEFAULT_CSV_COLUMNS)]
+    if 'isbn10' not in columns:
+        raise ValueError('CSV musí obsahovat sloupec isbn10')
+
+    sync = CatalogSync()
+    try:
+        sync.start()
+        _copy_raw(path, columns, header, encoding, delimiter)
+        _create_load_table(columns)
+
+        counts = db.session.execute(text("""
+            SELECT
+                (SELECT count(*) FROM catalog_load_raw) AS processed,
+                (SELECT count(*) FROM catalog_load_raw WHERE NULLIF(trim(isbn10), '') IS NOT NULL) AS valid,
+                (SELECT count(*) FROM catalog_load) AS distinct_isbns,
+                (SELECT count(*) FROM catalog_load l
+                 WHERE NOT EXISTS (SELECT 1 FROM book b WHERE b."ISBN10" = l.isbn10)) AS new
+        """)).one()
+        if not counts.valid:
+            # Prázdný snímek nesmí skrýt celý katalog
+            sync.abort()
+            return sync.progress()
+
+        sync.processed_records = counts.processed
+        sync.invalid_records = counts.processed - counts.valid
+        sync.new_books = counts.new
+
+        _stage_isbns(sync.sync_id)
+        changed = _upsert_books()
+        refresh_isbn_aliases(select(column('isbn10')).select_from(table('catalog_load')))
+        _audit_new_books(sync.sync_id)
+        _merge_genres()
+
+        # Opakovaný výskyt ISBN v souboru se počítá jako aktualizace,
+        # stejně jako při synchronizaci z CDB
+        sync.updated_books = changed - counts.new + counts.valid - counts.distinct_isbns
+        sync.unchanged_books = counts.distinct_isbns - changed
+        sync.batches = 1
+
+        sync.finish()
+        return sync.progress()
+    except Exception:
+        sync.abort()
+        raise
+
+def _read_header(path, encoding, delimiter):
+    with _open_csv(path) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding=_python_encoding(encoding)), delimiter=delimiter)
+        return next(reader, [])
+
+def _copy_raw(path, columns, header, encoding, delimiter):
+    column_list = ', '.join(_quote(name) for name in columns)
+    db.session.execute(text(f"""
+        CREATE TEMP TABLE catalog_load_raw (
+            line_no bigint GENERATED ALWAYS AS IDENTITY,
+            {', '.join(f'{_quote(name)} text' for name in columns)}
+        ) ON COMMIT DROP
+    """))
+
+    copy_sql = (
+        f"COPY catalog_load_raw ({column_list}) FROM STDIN "
+        f"WITH (FORMAT csv, HEADER {'true' if header else 'false'}, "
+        f"DELIMITER {_literal(delimiter)}, ENCODING {_literal(encoding)})"
+    )
+    # COPY běží na spojení aktuální session, tedy ve stejné transakci
+    connection = db.session.connection().connection.driver_connection
+    with _open_csv(path) as raw, connection.cursor() as cursor:
+        cursor.copy_expert(copy_sql, raw)
+
+def _create_load_table(columns):
+    def raw_column(name):
+        return f'raw.{_quote(name)}' if name in columns else 'NULL::text'
+
+    def number(name, sql_type, pattern):
+        return (f"CASE WHEN {raw_column(name)} ~ '{pattern}' "
+                f"THEN trim({raw_column(name)})::{sql_type} END")
+
+    # Poslední výskyt ISBN10 v souboru určuje výsledná data knihy
+    db.session.execute(text(f"""
+        CREATE TEMP TABLE catalog_load ON COMMIT DROP AS
+        SELECT DISTINCT ON (trim(raw.isbn10))
+            raw.line_no,
+            trim(raw.isbn10) AS isbn10,
+            NULLIF(trim({raw_column('isbn13')}), '') AS isbn13,
+            {raw_column('title')} AS title,
+            COALESCE({raw_column('authors')}, '') AS authors,
+            COALESCE({raw_column('categories')}, '') AS categories,
+            {raw_column('thumbnail')} AS thumbnail,
+            {raw_column('description')} AS description,
+            {number('published_year', 'integer', _INT_PATTERN)} AS published_year,
+            {number('num_pages', 'integer', _INT_PATTERN)} AS num_pages,
+            {number('average_rating', 'double precision', _FLOAT_PATTERN)} AS average_rating,
+            {number('ratings_count', 'integer', _INT_PATTERN)} AS ratings_count,
+            {number('price', 'double precision', _FLOAT_PATTERN)} AS price
+        FROM catalog_load_raw raw
+        WHERE NULLIF(trim(raw.isbn10), '') IS NOT NULL
+        ORDER BY trim(raw.isbn10), raw.line_no DESC
+    """))
+    db.session.execute(text('CREATE INDEX ON catalog_load (isbn10)'))
+    db.session.execute(text('ANALYZE catalog_load'))
+
+def _stage_isbns(sync_id):
+    db.session.execute(text("""
+        INSERT INTO catalog_sync_isbn (sync_id, isbn10, is_visible, is_new)
+        SELECT :sync_id, l.isbn10, COALESCE(l.price, 0) > 0,
+               NOT EXISTS (SELECT 1 FROM book b WHERE b."ISBN10" = l.isbn10)
+        FROM catalog_load l
+    """), {'sync_id': sync_id})
+
+def _upsert_books():
+    # Viditelnost existujících knih nastaví až CatalogSync.finish(); otisk
+    # obsahu se u změněných knih vynuluje, další synchronizace ho dopočítá
+    result = db.session.execute(text("""
+        INSERT INTO book ("ISBN10", "ISBN13", "Title", "Author", "Cover_Image", "Description",
+                          "Year_of_Publication", "Number_of_Pages", "Average_Rating",
+                          "Number_of_Ratings", "Price", is_visible, content_hash)
+        SELECT isbn10, isbn13, title, authors, thumbnail, description, published_year, num_pages,
+               average_rating, ratings_count, price, COALESCE(price, 0) > 0, NULL
+        FROM catalog_load
+        ON CONFLICT ("ISBN10") DO UPDATE SET
+            "ISBN13" = excluded."ISBN13",
+            "Title" = excluded."Title",
+            "Author" = excluded."Author",
+            "Cover_Image" = excluded."Cover_Image",
+            "Description" = excluded."Description",
+            "Year_of_Publication" = excluded."Year_of_Publication",
+            "Number_of_Pages" = excluded."Number_of_Pages",
+            "Average_Rating" = excluded."Average_Rating",
+            "Number_of_Ratings" = excluded."Number_of_Ratings",
+            "Price" = excluded."Price",
+            content_hash = NULL
+        WHERE (book."ISBN13", book."Title", book."Author", book."Cover_Image", book."Description",
+               book."Year_of_Publication", book."Number_of_Pages", book."Average_Rating",
+               book."Number_of_Ratings", book."Price")
+            IS DISTINCT FROM
+              (excluded."ISBN13", excluded."Title", excluded."Author", excluded."Cover_Image",
+               excluded."Description", excluded."Year_of_Publication", excluded."Number_of_Pages",
+               excluded."Average_Rating", excluded."Number_of_Ratings", excluded."Price")
+    """))
+    return result.rowcount
+
+def _audit_new_books(sync_id):
+    audit_table = AuditLog.__table__
+    staged = CatalogSyncIsbn.__table__
+    loaded = table('catalog_load', column('line_no'), column('isbn10'), column('authors'))
+
+    rows = select(
+        literal(AuditEventType.BOOK_ADD, audit_table.c.event_type.type),
+        literal(datetime.utcnow(), audit_table.c.timestamp.type),
+        literal(SYNC_USERNAME),
+        loaded.c.isbn10,
+        func.json_build_object('author', loaded.c.authors)
+    ).join_from(
+        loaded, staged, and_(staged.c.sync_id == sync_id, staged.c.isbn10 == loaded.c.isbn10)
+    ).where(staged.c.is_new == True).order_by(loaded.c.line_no)
+
+    db.session.execute(audit_table.insert().from_select(
+        ['event_type', 'timestamp', 'username', 'book_isbn', 'additional_data'],
+        rows
+    ))
+
+def _merge_genres():
+    # Názvy žánrů rozdělené stejně jako v split_genre_names
+    db.session.execute(text("""
+        CREATE TEMP TABLE catalog_load_genre ON COMMIT DROP AS
+        SELECT l.isbn10, l.line_no, g.position, trim(g.name) AS name
+        FROM catalog_load l,
+             regexp_split_to_table(replace(l.categories, ';', ','), ',') WITH ORDINALITY AS g(name, position)
+        WHERE trim(g.name) <> ''
+    """))
+
+    # Chybějící žánry - porovnání je case-insensitive, vyhrává první výskyt v souboru
+    db.session.execute(text("""
+        INSERT INTO genre (name, created_at, is_active)
+        SELECT DISTINCT ON (lower(lg.name)) lg.name, timezone('utc', now()), true
+        FROM catalog_load_genre lg
+        WHERE NOT EXISTS (SELECT 1 FROM genre g WHERE lower(g.name) = lower(lg.name))
+        ORDER BY lower(lg.name), lg.line_no, lg.position
+        ON CONFLICT (name) DO NOTHING
+    """))
+
+    db.session.execute(text('ANALYZE catalog_load_genre'))
+
+    # Otisk obsahu zahrnuje i žánry - knihy, kterým se žánry mění, musí další
+    # synchronizace z CDB zpracovat, i když se sloupce knihy nezměnily.
+    # Obě sady žánrů se agregují jednou pro všechny knihy (GROUP BY) a spojí.
+    db.session.execute(text("""
+        WITH loaded AS (
+            SELECT isbn10, array_agg(DISTINCT lower(name) ORDER BY lower(name)) AS names
+            FROM catalog_load_genre
+            GROUP BY isbn10
+        ), linked AS (
+            SELECT bg.book_isbn10 AS isbn10, array_agg(DISTINCT lower(g.name) ORDER BY lower(g.name)) AS names
+            FROM book_genres bg
+            JOIN catalog_load l ON l.isbn10 = bg.book_isbn10
+            JOIN genre g ON g.id = bg.genre_id
+            GROUP BY bg.book_isbn10
+        )
+        UPDATE book b SET content_hash = NULL
+        FROM catalog_load l
+        LEFT JOIN loaded ON loaded.isbn10 = l.isbn10
+        LEFT JOIN linked ON linked.isbn10 = l.isbn10
+        WHERE b."ISBN10" = l.isbn10
+          AND b.content_hash IS NOT NULL
+          AND COALESCE(loaded.names, '{}') IS DISTINCT FROM COALESCE(linked.names, '{}')
+    """))
+
+    db.session.execute(text("""
+        DELETE FROM book_genres bg
+        USING catalog_load l
+        WHERE bg.book_isbn10 = l.isbn10
+    """))
+
+    db.session.execute(text("""
+        INSERT INTO book_genres (book_isbn10, genre_id)
+        SELECT DISTINCT lg.isbn10, g.id
+        FROM catalog_load_genre lg
+        JOIN (
+            SELECT DISTINCT ON (lower(name)) id, lower(name) AS key
+            FROM genre
+            ORDER BY lower(name), id
+        ) g ON g.key = lower(lg.name)
+        ON CONFLICT DO NOTHING
+    """))
+
+def _open_csv(path):
+    with open(path, 'rb') as probe:
+        compressed = probe.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if compressed else open(path, 'rb')
+
+def _python_encoding(encoding):
+    return {'utf8': 'utf-8', 'latin1': 'latin-1', 'win1250': 'cp1250'}.get(encoding.lower(), encoding)
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
@@ -0,0 +1,186 @@
+# cache_operations.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .cache_version import CacheVersion
+from . import db
+
+# Názvy verzí obsahu - zvyšují se při každém potvrzeném zápisu
+CATALOG_CACHE_VERSION = 'catalog'        # knihy, žánry, hodnocení
+COMMENTS_CACHE_VERSION = 'comments'      # komentáře ke knihám
+FAVORITES_CACHE_VERSION = 'favorites'    # oblíbené knihy uživatelů
+CATALOG_SYNC_VERSION = 'catalog_sync'    # dokončené synchronizace katalogu
+# Jak často (v sekundách) proces ověřuje verzi v databázi
+VERSION_CHECK_INTERVAL = 2
+
+error_logger = logging.getLogger('error_logger')
+
+# Hlídače verzí v tomto procesu podle názvu obsahu
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+class LRUCache:
+    """
+    Omezená LRU cache s expirací záznamů (TTL) a statistikami.
+
+    Při překročení maxsize se zahodí nejdéle nepoužitý záznam. Cache je
+    bezpečná pro použití z více vláken jednoho procesu.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (nalezeno: bool, hodnota) - uložit lze i None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class CacheVersionWatcher:
+    """
+    Hlídá verzi obsahu v tabulce cache_version a při její změně vyprázdní
+    navázané cache procesu.
+
+    Verze se z databáze čte nejvýše jednou za check_interval sekund, změna
+    zapsaná jiným procesem se tedy projeví nejpozději po této době (změna
+    z tohoto procesu hned po commitu, viz bump_cache_version). Záznam
+    se do cache uloží jen tehdy, pokud byl načten při aktuální verzi, takže
+    data načtená před změnou do cache nepřetečou.
+    """
+
+    def __init__(self, name, caches, check_interval=VERSION_CHECK_INTERVAL):
+        self.name = name
+        self.caches = tuple(caches)
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.invalidations = 0
+        with _watchers_lock:
+            _watchers.setdefault(name, []).append(self)
+
+    def current(self):
+        """
+        Vrátí aktuální verzi obsahu, případně ji ověří v databázi.
+
+        Returns:
+            int|None: Verze, nebo None pokud ji nelze zjistit (cache se pak nepoužije)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._version
+
+        try:
+            version = get_cache_version(self.name)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            error_logger.error('Chyba při zjišťování verze cache %s: %s', self.name, str(e))
+            return None
+
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                for cache in self.caches:
+                    cache.clear()
+                self._version = version
+            self._checked_at = now
+        return version
+
+    def expire(self):
+        """Vynutí ověření verze v databázi při příštím přístupu."""
+        with self._lock:
+            self._checked_at = None
+
+    def get(self, cache, key, version):
+        if version is None:
+            return False, None
+        return cache.get(key)
+
+    def store(self, cache, key, value, version):
+        with self._lock:
+            if version is None or version != self._version:
+                return
+        cache.set(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {'version': self._version, 'invalidations': self.invalidations}
+
+def get_cache_version(name):
+    """
+    Získá verzi pojmenovaného obsahu (0, pokud ještě nebyla zvýšena).
+    """
+    version = db.session.query(CacheVersion.version).filter_by(name=name).scalar()
+    return version or 0
+
+def bump_cache_version(name):
+    """
+    Zvýší verzi pojmenovaného obsahu v rámci aktuální transakce.
+
+    Volá se před commitem změny, aby se nová verze stala viditelnou
+    současně se změněnými daty. Hlídače verze v tomto procesu ji ověří
+    při příštím přístupu.
+    """
+    now = datetime.utcnow()
+    stmt = pg_insert(CacheVersion).values(name=name, version=1, updated_at=now)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={'version': CacheVersion.version + 1, 'updated_at': now}
+    ))
+    with _watchers_lock:
+        watchers = list(_watchers.get(name, ()))
+    for watcher in watchers:
+        watcher.expire()
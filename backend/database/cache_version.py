@@ -0,0 +1,25 @@
+from datetime import datetime
+from . import db
+
+class CacheVersion(db.Model):
+    """
+    Version counter of cached content shared by all application processes.
+
+    Process-local caches remember the version they were filled at. Writers
+    increment the counter in the same transaction as their change, and
+    readers in other gunicorn workers drop their cached entries once they
+    see a newer version.
+
+    Attributes:
+        name (str): Name of the cached content (primary key), e.g. 'catalog'
+        version (int): Counter incremented on every committed change
+        updated_at (datetime): Timestamp of the last increment
+    """
+    __tablename__ = 'cache_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
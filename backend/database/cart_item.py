@@ -0,0 +1,32 @@
+from datetime import datetime
+from . import db
+
+class CartItem(db.Model):
+    """
+    A book in a user's shopping cart.
+
+    One row per user and book, so adding, removing and checking a book are
+    single primary key operations and the cart is shared by all application
+    processes. Carts previously stored in the Flask session are moved here
+    on the user's first cart access (see cart_operations).
+
+    Attributes:
+        user_id (int): Owner of the cart (primary key)
+        book_isbn10 (str): ISBN10 of the book in the cart (primary key)
+        added_at (datetime): When the book was added, the cart is listed newest first
+
+    Indexes:
+        (user_id, added_at) serves the paginated cart listing.
+    """
+    __tablename__ = 'cart_item'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    book_isbn10 = db.Column(db.String(10), db.ForeignKey('book.ISBN10', ondelete='CASCADE'), primary_key=True)
+    added_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_cart_item_user_added_at', 'user_id', 'added_at'),
+    )
+
+    def __repr__(self):
+        return f'<CartItem {self.book_isbn10} of user {self.user_id}>'
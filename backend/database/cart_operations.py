@@ -1,69 +1,40 @@
 # In cart_operations.py
 from flask import session
-from .book import Book
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from . import db
+from .cart_item import CartItem
+from .book_operations import get_cart_books
+from .isbn_operations import find_book_by_isbn, find_books_by_isbns
 from datetime import datetime
 
-def get_formatted_shopping_cart(page=1, per_page=25):
+def get_formatted_shopping_cart(page=1, per_page=25, fields=None):
     """
     Gets a formatted list of books in the shopping cart with pagination.
     Uses the current user's session.
+
+    fields limits the book fields in the response and the loaded columns
+    (see parse_fields).
     """
     # Ensure user is logged in
     user_id = session.get('user_id')
     if not user_id:
         return {'error': 'Uživatel není přihlášen'}
 
-    # Get cart from session using user-specific key
-    cart_key = f'shopping_cart_{user_id}'
-    cart = session.get(cart_key, [])
-
     try:
-        filtered_books = []
-        for cart_item in cart:
-            book = Book.query.filter(
-                (Book.ISBN10 == cart_item['isbn']) | (Book.ISBN13 == cart_item['isbn'])
-            ).first()
-
-            if book and book.is_visible:
-                filtered_books.append({
-                    'book': book,
-                    'is_visible': book.is_visible,
-                    'added_at': cart_item.get('added_at')
-                })
-
-        # Sort books by added_at in descending order
-        filtered_books.sort(key=lambda x: x['added_at'] or datetime.min, reverse=True)
-
-        # Pagination
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_books = filtered_books[start:end]
-
-        books_data = [{
-            'ISBN10': book['book'].ISBN10,
-            'ISBN13': book['book'].ISBN13,
-            'Title': book['book'].Title,
-            'Author': book['book'].Author,
-            'Genres': [genre.name for genre in book['book'].genres],
-            'Cover_Image': book['book'].Cover_Image,
-            'Description': book['book'].Description,
-            'Year_of_Publication': book['book'].Year_of_Publication,
-            'Number_of_Pages': book['book'].Number_of_Pages,
-            'Average_Rating': book['book'].Average_Rating,
-            'Number_of_Ratings': book['book'].Number_of_Ratings,
-            'Price': book['book'].Price,
-            'is_visible': book['is_visible']
-        } for book in paginated_books]
+        _migrate_session_cart(user_id)
+
+        books_data, total_books = get_cart_books(user_id, page, per_page, fields)
 
         return {
             'books': books_data,
-            'total_books': len(filtered_books),
+            'total_books': total_books,
             'page': page,
             'per_page': per_page,
-            'total_pages': (len(filtered_books) + per_page - 1) // per_page,
+            'total_pages': (total_books + per_page - 1) // per_page,
             'message': 'Košík byl úspěšně načten'
         }
     except Exception as e:
+        db.session.rollback()
         return {'error': f'Chyba při získávání knih v košíku: {str(e)}'}
 
 def toggle_cart(isbn):
@@ -76,14 +47,10 @@ def toggle_cart(isbn):
         return {'error': 'Uživatel není přihlášen'}
 
     try:
-        # Get user-specific cart from session
-        cart_key = f'shopping_cart_{user_id}'
-        cart = session.get(cart_key, [])
+        _migrate_session_cart(user_id)
 
         # Find the book
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
 
         if not book:
             return {'error': 'Kniha nenalezena'}
@@ -91,26 +58,30 @@ def toggle_cart(isbn):
         if not book.is_visible:
             return {'error': 'Kniha není dostupná'}
 
-        # Check if book is already in cart
-        existing_book = next((item for item in cart if item['isbn'] == book.ISBN10 or item['isbn'] == book.ISBN13), None)
+        # Remove the book if it is in the cart, otherwise add it
+        removed = db.session.execute(
+            CartItem.__table__.delete().where(
+                CartItem.user_id == user_id,
+                CartItem.book_isbn10 == book.ISBN10
+            )
+        ).rowcount
 
-        if existing_book:
-            # Remove book from cart
-            cart = [item for item in cart if item['isbn'] != book.ISBN10 and item['isbn'] != book.ISBN13]
+        if removed:
             action = 'odebrána z'
             is_in_cart = False
         else:
-            # Add book to cart
-            cart.append({
-                'isbn': book.ISBN10,
-                'added_at': datetime.utcnow()
-            })
+            # Souběžné přidání téže knihy (dvojklik) neskončí chybou
+            db.session.execute(
+                pg_insert(CartItem).values(
+                    user_id=user_id,
+                    book_isbn10=book.ISBN10,
+                    added_at=datetime.utcnow()
+                ).on_conflict_do_nothing()
+            )
             action = 'přidána do'
             is_in_cart = True
 
-        # Update user-specific session
-        session[cart_key] = cart
-        session.modified = True
+        db.session.commit()
 
         return {
             'message': f'Kniha byla {action} košíku',
@@ -122,6 +93,7 @@ def toggle_cart(isbn):
             }
         }
     except Exception as e:
+        db.session.rollback()
         return {'error': f'Chyba při změně stavu knihy v košíku: {str(e)}'}
 
 def clear_shopping_cart():
@@ -134,16 +106,18 @@ def clear_shopping_cart():
         return {'error': 'Uživatel není přihlášen'}
 
     try:
-        # Clear user-specific cart from session
-        cart_key = f'shopping_cart_{user_id}'
-        session[cart_key] = []
-        session.modified = True
+        db.session.execute(CartItem.__table__.delete().where(CartItem.user_id == user_id))
+        db.session.commit()
+
+        # Případný starý košík v session se už nepřevede
+        session.pop(_session_cart_key(user_id), None)
 
         return {
             'message': 'Košík byl úspěšně vyprázdněn',
             'success': True
         }
     except Exception as e:
+        db.session.rollback()
         return {
             'error': f'Chyba při mazání košíku: {str(e)}',
             'success': False
@@ -159,14 +133,10 @@ def is_book_in_shopping_cart(isbn):
         return {'error': 'Uživatel není přihlášen'}
 
     try:
-        # Get user-specific cart from session
-        cart_key = f'shopping_cart_{user_id}'
-        cart = session.get(cart_key, [])
+        _migrate_session_cart(user_id)
 
         # Find the book
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
 
         if not book:
             return {'error': 'Kniha nenalezena'}
@@ -175,10 +145,7 @@ def is_book_in_shopping_cart(isbn):
             return {'error': 'Kniha není dostupná'}
 
         # Check if book is in cart
-        is_in_cart = any(
-            item['isbn'] == book.ISBN10 or item['isbn'] == book.ISBN13 
-            for item in cart
-        )
+        is_in_cart = db.session.get(CartItem, (user_id, book.ISBN10)) is not None
 
         return {
             'is_in_cart': is_in_cart,
@@ -189,4 +156,29 @@ def is_book_in_shopping_cart(isbn):
             } if is_in_cart else None
         }
     except Exception as e:
+        db.session.rollback()
         return {'error': f'Chyba při kontrole knihy v košíku: {str(e)}'}
+
+def _session_cart_key(user_id):
+    return f'shopping_cart_{user_id}'
+
+def _migrate_session_cart(user_id):
+    # Převede košík uložený dříve v session do tabulky cart_item (jen jednou)
+    cart_key = _session_cart_key(user_id)
+    cart = session.get(cart_key)
+    if cart is None:
+        return
+
+    books = find_books_by_isbns(item['isbn'] for item in cart if item.get('isbn'))
+    rows = [{
+        'user_id': user_id,
+        'book_isbn10': books[item['isbn']].ISBN10,
+        'added_at': item.get('added_at') or datetime.utcnow()
+    } for item in cart if item.get('isbn') in books]
+
+    if rows:
+        db.session.execute(pg_insert(CartItem).values(rows).on_conflict_do_nothing())
+        db.session.commit()
+
+    session.pop(cart_key, None)
+    session.modified = True
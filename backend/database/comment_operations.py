@@ -2,6 +2,16 @@ from datetime import datetime
 from database.comment import db, Comment
 from database.book import Book
 from sqlalchemy.exc import SQLAlchemyError
+from database.cache_operations import CacheVersionWatcher, bump_cache_version, COMMENTS_CACHE_VERSION
+
+# Verze komentářů pro ETag - čte se při každém požadavku, komentář musí být vidět hned
+_comments_version = CacheVersionWatcher(COMMENTS_CACHE_VERSION, (), check_interval=0)
+
+def get_comments_version():
+    """
+    Získá aktuální verzi komentářů (mění se při přidání nebo smazání komentáře).
+    """
+    return _comments_version.current()
 
 def get_formatted_comments_for_book(book_isbn, page=1, per_page=10):
     """
@@ -46,6 +56,7 @@ def add_comment(book_isbn, user_id, text):
             created_at=datetime.utcnow()
         )
         db.session.add(new_comment)
+        bump_cache_version(COMMENTS_CACHE_VERSION)
         db.session.commit()
         return True, "Comment added successfully"
     except SQLAlchemyError as e:
@@ -85,6 +96,7 @@ def delete_comment(comment_id, user_id):
             return False, "Unauthorized to delete this comment"
 
         db.session.delete(comment)
+        bump_cache_version(COMMENTS_CACHE_VERSION)
         db.session.commit()
         return True, "Comment deleted successfully"
     except SQLAlchemyError as e:
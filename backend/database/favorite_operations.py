@@ -1,33 +1,34 @@
 from datetime import datetime
 from . import db
 from .book import Book
+from .book_operations import format_books_data, book_load_options
 from .user import User, favorite_books
+from .isbn_operations import find_book_by_isbn
 from sqlalchemy import select
+from .cache_operations import CacheVersionWatcher, bump_cache_version, FAVORITES_CACHE_VERSION
 
-def get_formatted_favorite_books(user_id, page=1, per_page=25):
+# Verze oblíbených knih pro ETag - čte se při každém požadavku
+_favorites_version = CacheVersionWatcher(FAVORITES_CACHE_VERSION, (), check_interval=0)
+
+def get_favorites_version():
+    """
+    Získá aktuální verzi oblíbených knih (mění se při každém přidání či odebrání).
+    """
+    return _favorites_version.current()
+
+def get_formatted_favorite_books(user_id, page=1, per_page=25, fields=None):
     """
     Získá formátovaný seznam oblíbených knih uživatele včetně metadat pro stránkování
+
+    fields omezí pole knih v odpovědi i načtené sloupce (viz parse_fields)
     """
-    books, total, error = get_user_favorite_books(user_id, page, per_page)
+    books, total, error = get_user_favorite_books(user_id, page, per_page, fields)
 
     if books is None:
         return {'error': error}
 
-    books_data = [{
-        'ISBN10': book['book'].ISBN10,
-        'ISBN13': book['book'].ISBN13,
-        'Title': book['book'].Title,
-        'Author': book['book'].Author,
-        'Genres': book['book'].Genres,
-        'Cover_Image': book['book'].Cover_Image,
-        'Description': book['book'].Description,
-        'Year_of_Publication': book['book'].Year_of_Publication,
-        'Number_of_Pages': book['book'].Number_of_Pages,
-        'Average_Rating': book['book'].Average_Rating,
-        'Number_of_Ratings': book['book'].Number_of_Ratings,
-        'Price': book['book'].Price,
-        'is_visible': book['is_visible']
-    } for book in books]
+    # Žánry celé stránky jedním dotazem
+    books_data = format_books_data([book['book'] for book in books], fields)
 
     return {
         'books': books_data,
@@ -47,9 +48,7 @@ def toggle_favorite(user_id, isbn):
             return False, "Uživatel nenalezen"
 
         # Hledáme knihu podle ISBN10 nebo ISBN13
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
         if not book:
             return False, "Kniha nenalezena"
 
@@ -83,13 +82,14 @@ def toggle_favorite(user_id, isbn):
 
             message = "Kniha byla přidána do oblíbených"
 
+        bump_cache_version(FAVORITES_CACHE_VERSION)
         db.session.commit()
         return True, message
     except Exception as e:
         db.session.rollback()
         return False, f"Chyba při změně stavu oblíbené knihy: {str(e)}"
 
-def get_user_favorite_books(user_id, page=1, per_page=25):
+def get_user_favorite_books(user_id, page=1, per_page=25, fields=None):
     """
     Získá seznam oblíbených knih uživatele
     """
@@ -104,7 +104,7 @@ def get_user_favorite_books(user_id, page=1, per_page=25):
             Book.ISBN10 == favorite_books.c.book_isbn10
         ).filter(
             favorite_books.c.user_id == user_id
-        )
+        ).options(*book_load_options(fields))
 
         total = query.count()
 
@@ -133,9 +133,7 @@ def is_book_favorite(user_id, isbn):
             return False, "Uživatel nenalezen"
 
         # Hledáme knihu podle ISBN10 nebo ISBN13
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
         if not book:
             return False, "Kniha nenalezena"
 
@@ -0,0 +1,28 @@
+from datetime import datetime
+from . import db
+
+class GenreFacet(db.Model):
+    """
+    Precomputed number of visible books per genre (catalog genre facet).
+
+    The table is a summary of book_genres joined with the visible books and is
+    rebuilt at the end of every catalog sync (see refresh_genre_facets), so
+    /api/genres reads the genre list with counts without joining and
+    de-duplicating the whole catalog. Only genres with at least one visible
+    book have a row.
+
+    Attributes:
+        genre_id (int): Genre the count belongs to (primary key)
+        name (str): Genre name, copied from Genre for join-free reads
+        book_count (int): Number of visible books in the genre
+        refreshed_at (datetime): Timestamp of the last refresh
+    """
+    __tablename__ = 'genre_facet'
+
+    genre_id = db.Column(db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    book_count = db.Column(db.Integer, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GenreFacet {self.name}={self.book_count}>'
@@ -1,17 +1,148 @@
 # genre_operations.py
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import exists, false, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from .genre import Genre
+from .genre_facet import GenreFacet
 from .book import Book, book_genres
+from .cache_operations import CacheVersionWatcher, CATALOG_SYNC_VERSION
 from . import db
 
-def filter_books_by_genres(query, genres_string):
+GENRE_CACHE_TTL = 300  # sekund, platnost procesové cache žánrů
+
+class GenreCache:
+    """
+    Case-insensitive cache žánrů {název malými písmeny: id}.
+
+    Cache se buď vytvoří pro jednu synchronizaci (a zahodí se s ní), nebo
+    se sdílí v rámci procesu přes get_process_genre_cache(). Po preload()
+    obsahuje všechny žánry z databáze a vyhledávání podle názvu ani
+    podřetězce už nevyžaduje dotaz do databáze.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = {}
+        self._complete = False
+        self.loaded_at = None
+
+    def preload(self):
+        """Načte všechny žánry jedním dotazem."""
+        rows = db.session.query(Genre.id, Genre.name).order_by(Genre.id).all()
+        self._ids = {}
+        self._names = {}
+        for genre_id, name in rows:
+            self._remember(genre_id, name)
+        self._complete = True
+        self.loaded_at = time.monotonic()
+        return self
+
+    def resolve(self, genre_names):
+        """
+        Přeloží názvy žánrů na ID, chybějící žánry hromadně vytvoří.
+
+        Args:
+            genre_names: Iterable názvů žánrů
+
+        Returns:
+            Dict {název žánru malými písmeny: id žánru}
+        """
+        # Pro každý klíč si pamatujeme první výskyt názvu - ten se použije při vytvoření
+        requested = {}
+        for name in genre_names:
+            requested.setdefault(name.lower(), name)
+
+        missing = {key: name for key, name in requested.items() if key not in self._ids}
+        if missing and not self._complete:
+            self._load(list(missing))
+            missing = {key: name for key, name in missing.items() if key not in self._ids}
+
+        if missing:
+            now = datetime.utcnow()
+            stmt = pg_insert(Genre.__table__).values([
+                {'name': name, 'created_at': now, 'is_active': True}
+                for name in missing.values()
+            ]).on_conflict_do_nothing(index_elements=['name'])
+            db.session.execute(stmt)
+            # Načteme i žánry, které mezitím vytvořil jiný proces
+            self._load(list(missing))
+
+        return {key: self._ids[key] for key in requested}
+
+    def matching_ids(self, term):
+        """
+        Vrátí ID žánrů, jejichž název obsahuje zadaný podřetězec (case-insensitive).
+        Vyžaduje předchozí preload().
+        """
+        term = term.lower()
+        return [genre_id for key, genre_id in self._ids.items() if term in key]
+
+    def name(self, genre_id):
+        return self._names.get(genre_id)
+
+    def _load(self, lowercase_names):
+        rows = db.session.query(Genre.id, Genre.name)\
+            .filter(func.lower(Genre.name).in_(lowercase_names))\
+            .order_by(Genre.id)\
+            .all()
+        for genre_id, name in rows:
+            self._remember(genre_id, name)
+
+    def _remember(self, genre_id, name):
+        # Při více variantách velikosti písmen vyhrává nejstarší žánr
+        self._ids.setdefault(name.lower(), genre_id)
+        self._names[genre_id] = name
+
+class _ProcessGenreCacheSlot:
+    # Drží procesovou GenreCache; clear() volá i hlídač verze synchronizace katalogu
+    def __init__(self):
+        self.cache = None
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.cache = None
+
+_process_genre_cache = _ProcessGenreCacheSlot()
+# Žánry přibývají jen synchronizací katalogu - po jejím dokončení (i v jiném
+# procesu, např. flask catalog load-csv) se cache zahodí ve všech procesech
+_genre_sync_version = CacheVersionWatcher(CATALOG_SYNC_VERSION, (_process_genre_cache,))
+
+def get_process_genre_cache(max_age=GENRE_CACHE_TTL):
+    """
+    Vrátí procesovou cache žánrů, při stáří nad max_age nebo po dokončené
+    synchronizaci katalogu ji znovu načte.
+
+    Slouží pouze pro čtení (filtrování); při synchronizaci se používá
+    vlastní GenreCache, aby se do sdílené cache nedostaly žánry
+    z transakce, která se nakonec vrátí.
+    """
+    _genre_sync_version.current()
+    slot = _process_genre_cache
+    with slot.lock:
+        cache = slot.cache
+        if cache is None or time.monotonic() - cache.loaded_at > max_age:
+            cache = GenreCache().preload()
+            slot.cache = cache
+        return cache
+
+def invalidate_process_genre_cache():
+    """Zahodí procesovou cache žánrů, další čtení ji načte znovu."""
+    _process_genre_cache.clear()
+
+def filter_books_by_genres(query, genres_string, genre_cache=None):
     """
     Filtruje knihy podle zadaných žánrů.
 
     Args:
         query: Existující SQLAlchemy query object s knihami
         genres_string: String se žánry oddělenými středníkem
+        genre_cache: GenreCache pro překlad termínů na ID žánrů
+                     (výchozí je procesová cache). Termín, který v cache
+                     nic nenajde, se ověří v databázi; neexistující žánr
+                     vrátí prázdný výsledek.
 
     Returns:
         SQLAlchemy query objekt s přidaným filtrem na žánry
@@ -24,79 +155,150 @@ def filter_books_by_genres(query, genres_string):
     if not genre_terms:
         return query
 
+    if genre_cache is None:
+        genre_cache = get_process_genre_cache()
+
     # Pro každý žánr najdeme odpovídající Genre záznamy
     for genre_term in genre_terms:
-        # Najdeme žánry, které odpovídají hledanému termínu
-        matching_genres = Genre.query.filter(Genre.name.ilike(f'%{genre_term}%')).all()
-        if matching_genres:
-            # Vytvoříme seznam ID nalezených žánrů
-            genre_ids = [genre.id for genre in matching_genres]
-            # Filtrujeme knihy, které mají vazbu na některý z těchto žánrů
-            query = query.join(book_genres).filter(book_genres.c.genre_id.in_(genre_ids))
+        # Najdeme žánry, které odpovídají hledanému termínu - bez dotazu do databáze
+        genre_ids = genre_cache.matching_ids(genre_term)
+        if not genre_ids:
+            # Žánr mohl vzniknout po načtení cache - ověříme v databázi
+            genre_ids = _matching_genre_ids_from_db(genre_term)
+        if not genre_ids:
+            # Neexistující žánr neodpovídá žádné knize, filtr se nesmí vynechat
+            return query.filter(false())
+
+        # Filtrujeme knihy, které mají vazbu na některý z těchto žánrů
+        query = query.filter(Book.ISBN10.in_(
+            select(book_genres.c.book_isbn10).where(book_genres.c.genre_id.in_(genre_ids))
+        ))
 
     return query
 
-def get_or_create_genres(genres_string):
+def _matching_genre_ids_from_db(term):
+    rows = db.session.query(Genre.id)\
+        .filter(func.lower(Genre.name).contains(term.lower(), autoescape=True))\
+        .all()
+    return [genre_id for genre_id, in rows]
+
+def split_genre_names(genres_string):
     """
-    Získá nebo vytvoří žánry z textového řetězce.
+    Rozdělí textový řetězec se žánry na jednotlivé názvy.
 
     Args:
         genres_string: String s žánry oddělenými čárkou nebo středníkem
 
     Returns:
-        List objektů Genre
+        List očištěných neprázdných názvů žánrů
     """
     if not genres_string:
         return []
 
     # Rozdělíme string na jednotlivé žánry a očistíme je
     genre_names = [name.strip() for name in genres_string.replace(';', ',').split(',')]
-    genre_names = [name for name in genre_names if name]  # Odstraníme prázdné stringy
+    return [name for name in genre_names if name]  # Odstraníme prázdné stringy
 
-    genres = []
-    for name in genre_names:
-        # Pro každý název žánru se pokusíme najít existující nebo vytvořit nový
-        genre = Genre.query.filter(Genre.name.ilike(name)).first()
-        if not genre:
-            genre = Genre(name=name, is_active=True)
-            db.session.add(genre)
-        genres.append(genre)
+def get_or_create_genre_ids(genre_names, genre_cache=None):
+    """
+    Hromadně přeloží názvy žánrů na jejich ID, chybějící žánry vytvoří.
+
+    Porovnání názvů je case-insensitive. Bez cache se existující žánry
+    načtou jedním dotazem a chybějící se vloží jedním
+    INSERT ... ON CONFLICT DO NOTHING.
 
-    return genres
+    Args:
+        genre_names: Iterable názvů žánrů
+        genre_cache: Volitelná GenreCache sdílená mezi voláními
 
-def update_book_genres(book, genres_string):
+    Returns:
+        Dict {název žánru malými písmeny: id žánru}
+    """
+    if genre_cache is None:
+        genre_cache = GenreCache()
+    return genre_cache.resolve(genre_names)
+
+def get_genre_names_by_isbn(isbn10s):
     """
-    Aktualizuje žánry knihy.
+    Získá názvy žánrů pro více knih najednou jedním dotazem.
+
+    Nahrazuje procházení book.genres (lazy='dynamic'), které pro každou
+    knihu na stránce posílá samostatný dotaz.
 
     Args:
-        book: Instance Book modelu
-        genres_string: String s žánry oddělenými čárkou nebo středníkem
+        isbn10s: Iterable ISBN10 knih
+
+    Returns:
+        Dict {ISBN10: [názvy žánrů]} - knihy bez žánrů ve slovníku chybí
     """
-    # Získáme nebo vytvoříme žánry
-    genres = get_or_create_genres(genres_string)
+    isbn10s = list(set(isbn10s))
+    if not isbn10s:
+        return {}
+
+    rows = db.session.query(
+        book_genres.c.book_isbn10,
+        func.array_agg(aggregate_order_by(Genre.name, Genre.id))
+    ).join(
+        Genre, Genre.id == book_genres.c.genre_id
+    ).filter(
+        book_genres.c.book_isbn10.in_(isbn10s)
+    ).group_by(
+        book_genres.c.book_isbn10
+    ).all()
 
-    # Aktualizujeme vazby knihy na žánry
-    book.genres = genres
+    return {isbn10: list(names) for isbn10, names in rows}
 
-def get_all_unique_genres():
+def refresh_genre_facets():
     """
-    Získá všechny unikátní žánry z aktivních knih.
+    Přepočítá počty viditelných knih podle žánrů v tabulce genre_facet.
 
-    Returns:
-        List[str]: Seřazený seznam názvů žánrů
-    """
-    try:
-        # Získáme všechny žánry, které mají alespoň jednu viditelnou knihu
-        active_genres = Genre.query\
-            .join(book_genres)\
-            .join(Book)\
-            .filter(Book.is_visible == True)\
-            .distinct()\
-            .order_by(Genre.name)\
-            .all()
+    Běží v aktuální transakci (volá se na konci synchronizace katalogu před
+    commitem), změna se tedy projeví současně se změnou katalogu. Počty se
+    zapíšou jedním INSERT ... SELECT ... ON CONFLICT DO UPDATE, takže souběžné
+    přepočty z více procesů nekolidují, a žánry bez viditelných knih se smažou.
+    """
+    now = datetime.utcnow()
+    visible_counts = select(
+        Genre.id, Genre.name, func.count(), literal(now)
+    ).join(
+        book_genres, book_genres.c.genre_id == Genre.id
+    ).join(
+        Book, Book.ISBN10 == book_genres.c.book_isbn10
+    ).where(
+        Book.is_visible == True
+    ).group_by(
+        Genre.id, Genre.name
+    )
 
-        # Vrátíme seřazený seznam názvů žánrů
-        return [genre.name for genre in active_genres]
-    except SQLAlchemyError as e:
-        print(f"Error getting unique genres: {str(e)}")
-        return []
+    stmt = pg_insert(GenreFacet).from_select(
+        ['genre_id', 'name', 'book_count', 'refreshed_at'], visible_counts
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[GenreFacet.genre_id],
+        set_={
+            'name': stmt.excluded.name,
+            'book_count': stmt.excluded.book_count,
+            'refreshed_at': stmt.excluded.refreshed_at
+        }
+    ))
+
+    has_visible_book = exists().where(
+        book_genres.c.genre_id == GenreFacet.genre_id,
+        Book.ISBN10 == book_genres.c.book_isbn10,
+        Book.is_visible == True
+    )
+    db.session.execute(GenreFacet.__table__.delete().where(~has_visible_book))
+
+def ensure_genre_facets():
+    """
+    Naplní tabulku genre_facet, pokud je prázdná (první spuštění po jejím
+    zavedení), a potvrdí transakci.
+
+    Returns:
+        bool: Zda byla tabulka naplněna
+    """
+    if db.session.query(GenreFacet.genre_id).first() is not None:
+        return False
+    refresh_genre_facets()
+    db.session.commit()
+    return True
@@ -0,0 +1,46 @@
+from datetime import datetime
+from . import db
+
+class IdempotencyKey(db.Model):
+    """
+    Idempotency key of a client request with a snapshot of its response.
+
+    A retried request with the same key gets the stored response instead of
+    being executed again. The key is inserted and its response stored in the
+    same transaction as the request's own writes, so the unique (user_id, key)
+    constraint serializes concurrent duplicates: they wait for that
+    transaction and then either read the stored response or, after a
+    rollback, claim the key themselves (see idempotency_operations).
+
+    Attributes:
+        id (int): Primary key
+        user_id (int): User who sent the request
+        key (str): Value of the Idempotency-Key header
+        request_hash (str): SHA-256 of the request body, a key cannot be reused
+            for a different request
+        status_code (int, optional): HTTP status of the stored response, None
+            only inside the transaction that claimed the key
+        response (dict, optional): JSON body of the stored response
+        created_at (datetime): When the key was claimed
+        expires_at (datetime): After this time the key may be used again
+
+    Indexes:
+        expires_at serves the purge of expired keys.
+    """
+    __tablename__ = 'idempotency_key'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    response = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} of user {self.user_id}>'
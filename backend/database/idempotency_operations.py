@@ -0,0 +1,127 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from . import db
+from .idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)   # jak dlouho se uložená odpověď vrací opakovaným požadavkům
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+def request_fingerprint(payload):
+    """Vrátí SHA-256 otisk JSON těla požadavku (nezávislý na pořadí klíčů)."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+def claim_idempotency_key(user_id, key, payload):
+    """
+    Zabere idempotenční klíč pro požadavek uživatele.
+
+    Klíč se vloží jedním INSERT ... ON CONFLICT a transakce zůstane otevřená:
+    zabraný klíč se potvrdí až commitem spolu s výsledkem požadavku
+    (record_idempotent_response). Souběžný požadavek se stejným klíčem na
+    unikátním omezení (user_id, key) počká na konec této transakce - po
+    commitu dostane uloženou odpověď, po rollbacku klíč zabere sám. Prošlý
+    klíč se přepíše.
+
+    Args:
+        user_id: ID uživatele
+        key: Hodnota hlavičky Idempotency-Key
+        payload: JSON tělo požadavku
+
+    Returns:
+        Dict s jedním z klíčů:
+        - 'claimed': ID záznamu, požadavek se má provést, výsledek uložit
+          (record_idempotent_response) a potvrdit jedním commitem, nebo klíč
+          uvolnit (release_idempotency_key)
+        - 'response' a 'status_code': uložená odpověď původního požadavku
+        - 'error' a 'status_code': klíč je neplatný (400) nebo byl použit
+          pro jiný požadavek (422)
+    """
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return {
+            'error': f'Idempotency-Key musí mít 1 až {MAX_IDEMPOTENCY_KEY_LENGTH} znaků',
+            'status_code': 400
+        }
+
+    request_hash = request_fingerprint(payload)
+    now = datetime.utcnow()
+    try:
+        insert = pg_insert(IdempotencyKey).values(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + IDEMPOTENCY_KEY_TTL
+        )
+        claimed = db.session.execute(
+            insert.on_conflict_do_update(
+                constraint='uq_idempotency_key_user_key',
+                set_={
+                    'request_hash': insert.excluded.request_hash,
+                    'status_code': None,
+                    'response': None,
+                    'created_at': insert.excluded.created_at,
+                    'expires_at': insert.excluded.expires_at
+                },
+                where=IdempotencyKey.expires_at < now
+            ).returning(IdempotencyKey.id)
+        ).scalar()
+
+        if claimed is not None:
+            return {'claimed': claimed}
+
+        existing = db.session.query(
+            IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response
+        ).filter_by(user_id=user_id, key=key).first()
+        db.session.rollback()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return {'error': f'Chyba při zpracování Idempotency-Key: {str(e)}', 'status_code': 500}
+
+    if existing is None:
+        # Prošlý klíč mezitím smazal úklid
+        return claim_idempotency_key(user_id, key, payload)
+
+    if existing.request_hash != request_hash:
+        return {'error': 'Idempotency-Key byl již použit pro jiný požadavek', 'status_code': 422}
+
+    return {'response': existing.response, 'status_code': existing.status_code}
+
+def record_idempotent_response(claim_id, status_code, response):
+    """
+    Zapíše odpověď požadavku k zabranému klíči v rámci otevřené transakce.
+
+    Necommituje - odpověď se potvrdí stejným commitem jako výsledek
+    požadavku, takže klíč bez odpovědi (ani výsledek bez klíče) nikdy
+    nevznikne.
+
+    Raises:
+        SQLAlchemyError: Při chybě databáze, volající musí transakci vrátit
+    """
+    updated = db.session.query(IdempotencyKey).filter_by(id=claim_id).update(
+        {'status_code': status_code, 'response': response}
+    )
+    if updated != 1:
+        raise SQLAlchemyError(f'Idempotenční klíč {claim_id} nebyl nalezen')
+
+def release_idempotency_key():
+    """
+    Uvolní zabraný klíč po neúspěšném požadavku (rollback otevřené transakce),
+    klient pak může požadavek zopakovat.
+    """
+    db.session.rollback()
+
+def purge_expired_idempotency_keys():
+    """
+    Smaže prošlé idempotenční klíče.
+
+    Returns:
+        int: Počet smazaných klíčů
+    """
+    deleted = db.session.query(IdempotencyKey)\
+        .filter(IdempotencyKey.expires_at < datetime.utcnow())\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,24 @@
+from . import db
+
+class IsbnAlias(db.Model):
+    """
+    Lookup table mapping every accepted ISBN form to the book's primary key.
+
+    Each book has one row for its ISBN10 and one for its ISBN13, stored in
+    normalized form (without hyphens and spaces, upper case - see
+    normalize_isbn). Resolving an ISBN of either form is a single primary key
+    probe instead of an OR over the ISBN10 and ISBN13 columns. Rows are
+    maintained by the catalog sync and the CSV bulk load.
+
+    Attributes:
+        isbn (str): Normalized ISBN10 or ISBN13 (primary key)
+        book_isbn10 (str): ISBN10 of the book the alias resolves to
+    """
+    __tablename__ = 'isbn_alias'
+
+    isbn = db.Column(db.String(13), primary_key=True)
+    book_isbn10 = db.Column(db.String(10), db.ForeignKey('book.ISBN10', ondelete='CASCADE'),
+                            nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IsbnAlias {self.isbn} -> {self.book_isbn10}>'
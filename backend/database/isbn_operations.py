@@ -0,0 +1,116 @@
+# isbn_operations.py
+from sqlalchemy import func, select, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .book import Book
+from .isbn_alias import IsbnAlias
+from . import db
+
+def normalize_isbn(isbn):
+    """
+    Převede ISBN na normalizovaný tvar používaný v tabulce isbn_alias
+    (bez pomlček a mezer, velká písmena - kontrolní číslice X).
+    """
+    return (isbn or '').strip().replace('-', '').replace(' ', '').upper()
+
+def resolve_isbn(isbn):
+    """
+    Přeloží ISBN10 nebo ISBN13 (i s pomlčkami) na ISBN10 knihy.
+
+    Returns:
+        str|None: ISBN10 knihy, None pokud kniha neexistuje
+    """
+    normalized = normalize_isbn(isbn)
+    if not normalized:
+        return None
+    return db.session.query(IsbnAlias.book_isbn10).filter(IsbnAlias.isbn == normalized).scalar()
+
+def find_book_by_isbn(isbn, *options):
+    """
+    Najde knihu podle ISBN10 nebo ISBN13 jedním dotazem přes primární
+    klíče tabulek isbn_alias a book. Viditelnost knihy se nekontroluje.
+
+    Args:
+        isbn: ISBN10 nebo ISBN13, i s pomlčkami či mezerami
+        options: Volby dotazu, např. book_load_options(fields)
+
+    Returns:
+        Book|None
+    """
+    normalized = normalize_isbn(isbn)
+    if not normalized:
+        return None
+    return Book.query.options(*options)\
+        .join(IsbnAlias, IsbnAlias.book_isbn10 == Book.ISBN10)\
+        .filter(IsbnAlias.isbn == normalized)\
+        .first()
+
+def find_books_by_isbns(isbns, *options):
+    """
+    Najde knihy pro více ISBN10 nebo ISBN13 najednou jedním dotazem.
+
+    Args:
+        isbns: Iterable ISBN v libovolném tvaru
+        options: Volby dotazu, např. book_load_options(fields)
+
+    Returns:
+        Dict {ISBN v požadovaném tvaru: Book} - nenalezená ISBN ve slovníku chybí
+    """
+    requested = {isbn: normalize_isbn(isbn) for isbn in isbns}
+    normalized = {value for value in requested.values() if value}
+    if not normalized:
+        return {}
+
+    rows = db.session.query(IsbnAlias.isbn, Book).options(*options)\
+        .join(Book, Book.ISBN10 == IsbnAlias.book_isbn10)\
+        .filter(IsbnAlias.isbn.in_(normalized))\
+        .all()
+    books = dict(rows)
+    return {isbn: books[value] for isbn, value in requested.items() if value in books}
+
+def refresh_isbn_aliases(isbn10s=None):
+    """
+    Přepočítá aliasy ISBN zadaných knih v rámci aktuální transakce.
+
+    Staré aliasy knih se smažou (kniha mohla změnit ISBN13) a vloží se
+    aliasy podle aktuálních hodnot v tabulce book.
+
+    Args:
+        isbn10s: List ISBN10 nebo SQL select s ISBN10, None pro celý katalog
+    """
+    alias_table = IsbnAlias.__table__
+    delete = alias_table.delete()
+    if isbn10s is not None:
+        delete = delete.where(alias_table.c.book_isbn10.in_(isbn10s))
+    db.session.execute(delete)
+
+    aliases = []
+    for column in (Book.ISBN10, Book.ISBN13):
+        alias = select(_normalize_isbn_sql(column).label('isbn'), Book.ISBN10.label('book_isbn10'))\
+            .where(column.isnot(None))
+        if isbn10s is not None:
+            alias = alias.where(Book.ISBN10.in_(isbn10s))
+        aliases.append(alias)
+
+    stmt = pg_insert(alias_table).from_select(['isbn', 'book_isbn10'], union(*aliases))
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[alias_table.c.isbn],
+        set_={'book_isbn10': stmt.excluded.book_isbn10}
+    ))
+
+def ensure_isbn_aliases():
+    """
+    Naplní tabulku isbn_alias, pokud je prázdná (první spuštění po jejím
+    zavedení), a potvrdí transakci.
+
+    Returns:
+        bool: Zda byla tabulka naplněna
+    """
+    if db.session.query(IsbnAlias.isbn).first() is not None:
+        return False
+    refresh_isbn_aliases()
+    db.session.commit()
+    return True
+
+def _normalize_isbn_sql(column):
+    # Stejná normalizace jako normalize_isbn
+    return func.upper(func.replace(func.replace(column, '-', ''), ' ', ''))
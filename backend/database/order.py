@@ -50,6 +50,11 @@ class Order(db.Model):
     # Vztahy
     user = db.relationship('User', backref=db.backref('orders', lazy=True))
 
+    # Historie objednávek uživatele (nejnovější první, stránkování kurzorem)
+    __table_args__ = (
+        db.Index('ix_order_user_created_at', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Order {self.id}>'
 
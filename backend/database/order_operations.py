@@ -1,20 +1,127 @@
+import base64
+import binascii
+import json
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only, selectinload
 from . import db
-from .order import Order, OrderItem, PaymentMethod, OrderStatus
 from .book import Book
+from .order import Order, OrderItem, PaymentMethod, OrderStatus
 from .user import User
+from .isbn_operations import find_books_by_isbns
+from .idempotency_operations import record_idempotent_response
+
+# Ceny se počítají a porovnávají v Decimal na haléře. Klient posílá přirážku
+# nezaokrouhlenou a celkovou cenu zaokrouhlenou, odchylka o jeden haléř se toleruje.
+CENT = Decimal('0.01')
+PRICE_TOLERANCE = CENT
 
 def calculate_payment_fee(payment_method, subtotal):
-    """Vypočítá přirážku za platební metodu"""
+    """Vypočítá přirážku za platební metodu (zaokrouhlenou na haléře, 0.5 nahoru)"""
     if payment_method == PaymentMethod.CASH_ON_DELIVERY:
         return 50.0
     elif payment_method == PaymentMethod.CARD_ONLINE:
-        return round(subtotal * 0.01, 2)  # 1% z ceny
+        return float(_to_money(_to_decimal(subtotal) / 100))  # 1% z ceny
     return 0.0  # Pro bankovní převod
 
-def create_order(user_id, cart_items, email, shipping_address, billing_address, payment_method, payment_fee, total_price):
+def price_order(cart_items, payment_method):
+    """
+    Ocení objednávku podle aktuálních cen katalogu.
+
+    Knihy všech položek se načtou jedním dotazem, cena položky je Book.Price
+    a přirážka se počítá z mezisoučtu (calculate_payment_fee).
+
+    Args:
+        cart_items: List dictů {'isbn', 'quantity'}
+        payment_method: Název platební metody (např. 'card_online')
+
+    Returns:
+        Dict s položkami (book, quantity, price_per_item), mezisoučtem,
+        přirážkou a celkovou cenou
+
+    Raises:
+        ValueError: Pokud je platební metoda neplatná, položka neúplná
+                    nebo kniha není dostupná
+    """
+    method = PaymentMethod.__members__.get(str(payment_method).upper())
+    if method is None:
+        raise ValueError('Neplatná platební metoda')
+
+    if not isinstance(cart_items, list) or not cart_items:
+        raise ValueError('Objednávka neobsahuje žádné položky')
+
+    for item in cart_items:
+        if not isinstance(item, dict) or not isinstance(item.get('isbn'), str):
+            raise ValueError('Položka objednávky musí obsahovat ISBN')
+        quantity = item.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError(f'Neplatné množství knihy {item["isbn"]}')
+
+    books = find_books_by_isbns(item['isbn'] for item in cart_items)
+
+    lines = []
+    for item in cart_items:
+        book = books.get(item['isbn'])
+        if not book or not book.is_visible or book.Price is None:
+            raise ValueError(f'Kniha {item["isbn"]} není dostupná')
+        lines.append((book, item.get('quantity', 1), book.Price))
+
+    subtotal = _to_money(sum(_to_decimal(price) * quantity for _, quantity, price in lines))
+    payment_fee = calculate_payment_fee(method, subtotal)
+    return {
+        'items': lines,
+        'payment_method': method,
+        'subtotal': float(subtotal),
+        'payment_fee': payment_fee,
+        'total_price': float(subtotal + _to_decimal(payment_fee))
+    }
+
+def find_price_mismatches(pricing, cart_items, payment_fee, total_price):
+    """
+    Porovná ceny zaslané klientem s oceněním serveru (price_order).
+
+    Returns:
+        List názvů polí, ve kterých se ceny liší o více než PRICE_TOLERANCE
+        ('price' u položky je ve tvaru 'price:<isbn>')
+    """
+    mismatches = []
+    for item, (_, _, price) in zip(cart_items, pricing['items']):
+        if 'price' in item and not _prices_match(item['price'], price):
+            mismatches.append(f'price:{item["isbn"]}')
+    if not _prices_match(payment_fee, pricing['payment_fee']):
+        mismatches.append('payment_fee')
+    if not _prices_match(total_price, pricing['total_price']):
+        mismatches.append('total_price')
+    return mismatches
+
+def _prices_match(client_value, server_value):
+    if isinstance(client_value, bool):
+        return False
+    try:
+        return abs(_to_decimal(client_value) - _to_decimal(server_value)) <= PRICE_TOLERANCE
+    except (InvalidOperation, TypeError, ValueError):
+        return False
+
+def _to_decimal(value):
+    # Přes str, aby float 12.63 byl Decimal('12.63') a ne jeho binární aproximace
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def _to_money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def create_order(user_id, cart_items, email, shipping_address, billing_address, payment_method, payment_fee, total_price,
+                 idempotency_claim=None):
     """
     Creates a new order with GDPR consent from order form
+
+    Prices are computed on the server (price_order). The prices sent by the
+    client only confirm what the user saw - if they differ from the catalog,
+    the order is rejected and the response contains the current pricing.
+
+    With idempotency_claim (ID from claim_idempotency_key) the response is
+    stored to the key in the same transaction as the order, so the order and
+    its snapshot are committed together or not at all.
     """
     try:
         # Ověření existence uživatele
@@ -22,6 +129,20 @@ def create_order(user_id, cart_items, email, shipping_address, billing_address,
         if not user:
             return {'error': 'Uživatel neexistuje'}
 
+        # Ocenění podle katalogu - všechny knihy jedním dotazem
+        try:
+            pricing = price_order(cart_items, payment_method)
+        except ValueError as e:
+            return {'error': str(e)}
+
+        mismatches = find_price_mismatches(pricing, cart_items, payment_fee, total_price)
+        if mismatches:
+            return {
+                'error': 'Ceny v objednávce neodpovídají aktuálním cenám',
+                'mismatches': mismatches,
+                'pricing': format_pricing_data(pricing)
+            }
+
         # Odstranit GDPR kontrolu z user profilu - používáme souhlas z formuláře
 
         # Vytvoření objednávky
@@ -36,44 +157,56 @@ def create_order(user_id, cart_items, email, shipping_address, billing_address,
             billing_city=billing_address['city'],
             billing_postal_code=billing_address['postal_code'],
             billing_country=billing_address['country'],
-            payment_method=PaymentMethod[payment_method.upper()],
-            payment_fee=payment_fee,
-            total_price=total_price,
+            payment_method=pricing['payment_method'],
+            payment_fee=pricing['payment_fee'],
+            total_price=pricing['total_price'],
             gdpr_consent=True,  # Vždy True, protože formulář to vyžaduje
             gdpr_consent_date=datetime.utcnow(),
             status=OrderStatus.PENDING
         )
 
         # Přidání položek objednávky
-        for item in cart_items:
-            book = Book.query.filter(
-                (Book.ISBN10 == item['isbn']) | (Book.ISBN13 == item['isbn'])
-            ).first()
-
-            if not book or not book.is_visible:
-                db.session.rollback()
-                return {'error': f'Kniha {item["isbn"]} není dostupná'}
-
+        for book, quantity, price in pricing['items']:
             order_item = OrderItem(
                 book_isbn10=book.ISBN10,
-                quantity=item['quantity'],
-                price_per_item=item['price']
+                quantity=quantity,
+                price_per_item=price
             )
             new_order.items.append(order_item)
 
-        # Uložení do databáze
+        # Uložení do databáze - objednávka i odpověď idempotenčního klíče jedním commitem
         db.session.add(new_order)
-        db.session.commit()
+        db.session.flush()
 
-        return {
+        result = {
             'message': 'Objednávka byla úspěšně vytvořena',
             'order': format_order_data(new_order)
         }
+        if idempotency_claim is not None:
+            record_idempotent_response(idempotency_claim, 201, result)
+
+        db.session.commit()
+
+        return result
 
     except Exception as e:
         db.session.rollback()
         return {'error': f'Chyba při vytváření objednávky: {str(e)}'}
 
+def format_pricing_data(pricing):
+    """Helper funkce pro formátování ocenění objednávky"""
+    return {
+        'items': [{
+            'book_isbn10': book.ISBN10,
+            'quantity': quantity,
+            'price_per_item': price
+        } for book, quantity, price in pricing['items']],
+        'payment_method': pricing['payment_method'].value,
+        'subtotal': pricing['subtotal'],
+        'payment_fee': pricing['payment_fee'],
+        'total_price': pricing['total_price']
+    }
+
 def format_order_data(order):
     """Helper funkce pro formátování dat objednávky"""
     return {
@@ -120,16 +253,77 @@ def get_order(order_id, user_id=None):
     except Exception as e:
         return {'error': f'Chyba při získávání objednávky: {str(e)}'}
 
-def get_user_orders(user_id):
+def get_user_orders(user_id, page=1, per_page=25, cursor=None):
     """
-    Získá seznam všech objednávek uživatele
+    Získá stránku objednávek uživatele, nejnovější první.
+
+    Stránkovat lze offsetem (page) nebo kurzorem (next_cursor předchozí
+    stránky, klíč created_at a id poslední objednávky). Obojí čte přes index
+    (user_id, created_at). Položky objednávek a názvy jejich knih se načtou
+    hromadně (selectinload), stránka tedy stojí stejný počet dotazů bez
+    ohledu na počet objednávek a položek.
+
+    Bez per_page (None) se vrátí všechny objednávky uživatele jako dřív -
+    jen s jejich celkovým počtem, bez údajů o stránkování.
+
+    Returns:
+        Dict s objednávkami, celkovým počtem a next_cursor (None na poslední stránce)
+
+    Raises:
+        ValueError: Pokud kurzor není platný
     """
+    key = _decode_order_cursor(cursor) if cursor else None
     try:
-        orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
-        return {'orders': [format_order_data(order) for order in orders]}
+        query = Order.query.filter_by(user_id=user_id)
+        page_query = query.options(
+            selectinload(Order.items).selectinload(OrderItem.book).options(
+                load_only(Book.ISBN10, Book.Title)
+            )
+        ).order_by(Order.created_at.desc(), Order.id.desc())
+
+        if per_page is None:
+            orders = page_query.all()
+            return {
+                'orders': [format_order_data(order) for order in orders],
+                'total_orders': len(orders)
+            }
+
+        total_orders = query.count()
+        if key:
+            page_query = page_query.filter(tuple_(Order.created_at, Order.id) < tuple_(*key))
+        else:
+            page_query = page_query.offset((page - 1) * per_page)
+
+        # O objednávku navíc - pozná se z ní, zda existuje další stránka
+        orders = page_query.limit(per_page + 1).all()
+        next_cursor = _encode_order_cursor(orders[per_page - 1]) if len(orders) > per_page else None
+        orders = orders[:per_page]
+
+        return {
+            'orders': [format_order_data(order) for order in orders],
+            'total_orders': total_orders,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total_orders + per_page - 1) // per_page,
+            'next_cursor': next_cursor
+        }
     except Exception as e:
         return {'error': f'Chyba při získávání objednávek: {str(e)}'}
 
+def _encode_order_cursor(order):
+    payload = json.dumps([order.created_at.isoformat(), order.id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def _decode_order_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, order_id = json.loads(payload.decode('utf-8'))
+        if not isinstance(order_id, int):
+            raise ValueError
+        return datetime.fromisoformat(created_at), order_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError('Neplatný kurzor')
+
 def update_order_status(order_id, new_status, user_id=None):
     """
     Aktualizuje status objednávky
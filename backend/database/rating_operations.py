@@ -1,7 +1,8 @@
 from sqlalchemy import func
 from database import db
-from database.book import Book
 from database.rating import Rating
+from database.isbn_operations import find_book_by_isbn
+from database.cache_operations import bump_cache_version, CATALOG_CACHE_VERSION
 
 def add_or_update_rating(user_id, isbn, rating_value):
     """
@@ -17,9 +18,7 @@ def add_or_update_rating(user_id, isbn, rating_value):
     """
     try:
         # First find the book
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
 
         if not book:
             return False, "Kniha nebyla nalezena"
@@ -60,9 +59,16 @@ def add_or_update_rating(user_id, isbn, rating_value):
         new_rating_sum = old_rating_sum + rating_value
 
         # Update book statistics with combined ratings
+        new_average = new_rating_sum / new_count if new_count > 0 else None
+        if (book.Number_of_Ratings, book.Average_Rating) != (new_count, new_average):
+            # Otisk už neodpovídá uloženým datům - další synchronizace nesmí
+            # knihu přeskočit jako nezměněnou
+            book.content_hash = None
         book.Number_of_Ratings = new_count
-        book.Average_Rating = new_rating_sum / new_count if new_count > 0 else None
+        book.Average_Rating = new_average
 
+        # Změněné hodnocení knihy musí zneplatnit cache katalogu
+        bump_cache_version(CATALOG_CACHE_VERSION)
         db.session.commit()
 
         return True, "Hodnocení bylo úspěšně uloženo"
@@ -83,9 +89,7 @@ def get_user_rating(user_id, isbn):
         tuple: (rating: int|None, error: str|None)
     """
     try:
-        book = Book.query.filter(
-            (Book.ISBN10 == isbn) | (Book.ISBN13 == isbn)
-        ).first()
+        book = find_book_by_isbn(isbn)
 
         if not book:
             return None, "Kniha nebyla nalezena"
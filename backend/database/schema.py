@@ -0,0 +1,91 @@
+# schema.py
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+
+# Konfigurace fulltextového vyhledávání, nad kterou je postaven sloupec book.search_vector
+BOOK_SEARCH_CONFIG = 'book_search'
+BOOK_SEARCH_BASE_CONFIG = 'english'
+
+# Typy tokenů s ne-ASCII znaky, u kterých se odstraňuje diakritika
+_UNACCENT_TOKEN_TYPES = 'word, hword, hword_part'
+
+error_logger = logging.getLogger('error_logger')
+info_logger = logging.getLogger('info_logger')
+
+def ensure_search_schema(use_unaccent=True):
+    """
+    Připraví databázové objekty fulltextového a podřetězcového vyhledávání knih.
+
+    Zapne rozšíření pg_trgm, na kterém stojí trigramové indexy pro filtry
+    podle názvu, autora a ISBN. Dále vytvoří textovou konfiguraci BOOK_SEARCH_CONFIG (kopie anglické) a podle
+    nastavení do ní přidá slovník unaccent, aby se jména jako "Dvořák" nebo
+    "Molière" našla i bez diakritiky. Musí běžet před db.create_all() a před
+    migracemi, protože na nich závisí generovaný sloupec book.search_vector
+    a indexy tabulky book. Při změně nastavení unaccent se vektory přepočítají.
+
+    Args:
+        use_unaccent: Zda konfigurace odstraňuje diakritiku
+    """
+    if not _ensure_extension('pg_trgm'):
+        error_logger.error('Rozšíření pg_trgm není dostupné, trigramové indexy knih nelze vytvořit')
+
+    if use_unaccent and not _ensure_extension('unaccent'):
+        error_logger.error('Rozšíření unaccent není dostupné, vyhledávání bude citlivé na diakritiku')
+        use_unaccent = False
+
+    try:
+        exists = db.session.execute(
+            text('SELECT 1 FROM pg_ts_config WHERE cfgname = :name'),
+            {'name': BOOK_SEARCH_CONFIG}
+        ).scalar() is not None
+        if not exists:
+            db.session.execute(text(
+                f'CREATE TEXT SEARCH CONFIGURATION {BOOK_SEARCH_CONFIG} (COPY = {BOOK_SEARCH_BASE_CONFIG})'
+            ))
+
+        has_unaccent = db.session.execute(text("""
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_ts_config_map m
+                JOIN pg_ts_config c ON c.oid = m.mapcfg
+                JOIN pg_ts_dict d ON d.oid = m.mapdict
+                WHERE c.cfgname = :name AND d.dictname = 'unaccent'
+            )
+        """), {'name': BOOK_SEARCH_CONFIG}).scalar()
+
+        if has_unaccent != use_unaccent:
+            dictionaries = f'unaccent, {BOOK_SEARCH_BASE_CONFIG}_stem' if use_unaccent \
+                else f'{BOOK_SEARCH_BASE_CONFIG}_stem'
+            db.session.execute(text(
+                f'ALTER TEXT SEARCH CONFIGURATION {BOOK_SEARCH_CONFIG} '
+                f'ALTER MAPPING FOR {_UNACCENT_TOKEN_TYPES} WITH {dictionaries}'
+            ))
+            if exists:
+                _refresh_search_vectors()
+
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        error_logger.error('Chyba při přípravě fulltextového vyhledávání: %s', str(e))
+
+def _ensure_extension(name):
+    try:
+        db.session.execute(text(f'CREATE EXTENSION IF NOT EXISTS {name}'))
+        db.session.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        error_logger.error('Chyba při vytváření rozšíření %s: %s', name, str(e))
+        return False
+
+def _refresh_search_vectors():
+    # Uložené generované sloupce se přepočítají při každém UPDATE řádku
+    column_exists = db.session.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'book' AND column_name = 'search_vector'
+    """)).scalar() is not None
+    if column_exists:
+        db.session.execute(text('UPDATE book SET search_vector = DEFAULT'))
+        info_logger.info('Fulltextové vektory knih byly přepočítány po změně konfigurace %s', BOOK_SEARCH_CONFIG)
@@ -0,0 +1,88 @@
+from enum import Enum
+from datetime import datetime
+from . import db
+
+class CatalogSyncIsbn(db.Model):
+    """
+    Staging table of ISBNs received during a running catalog sync.
+
+    Every batch of a sync writes the ISBN10s it received here, together with the
+    visibility the book should end up with. At the end of the sync the hidden and
+    shown books are computed in the database from this table, so no per-book state
+    has to be held in memory and only books whose visibility changes are updated.
+    Rows are removed when the sync finishes or is aborted; rows left behind by
+    a crashed sync are purged when the next sync starts.
+
+    The table is UNLOGGED - its rows only live for the duration of one sync, so
+    they are not written to WAL (and are not replicated). PostgreSQL empties
+    the table after a crash, which is fine for staging data.
+
+    Attributes:
+        sync_id (str): Identifier of the sync run the row belongs to
+        isbn10 (str): ISBN10 of the received book
+        is_visible (bool): Visibility the book gets after the sync (price > 0)
+        is_new (bool): Whether the book was inserted by this sync
+    """
+    __tablename__ = 'catalog_sync_isbn'
+
+    sync_id = db.Column(db.String(36), primary_key=True)
+    isbn10 = db.Column(db.String(10), primary_key=True)
+    is_visible = db.Column(db.Boolean, nullable=False)
+    is_new = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    def __repr__(self):
+        return f'<CatalogSyncIsbn {self.isbn10} in sync {self.sync_id}>'
+
+class SyncJobStatus(Enum):
+    QUEUED = 'queued'         # Čeká na zpracování
+    RUNNING = 'running'       # Právě běží
+    SUCCEEDED = 'succeeded'   # Dokončeno
+    FAILED = 'failed'         # Selhalo
+
+class SyncJob(db.Model):
+    """
+    Background catalog sync job.
+
+    The submitted payload is spooled to a file and processed by an in-process
+    worker thread. At most one job can be queued and one running at a time -
+    both are enforced by partial unique indexes, so concurrent submissions
+    coalesce into the single queued job (the newest payload wins) and
+    gunicorn workers cannot start two jobs at once. Syncs outside the job
+    queue are serialized by the advisory lock of CatalogSync.
+
+    Attributes:
+        id (int): Primary key, returned to the client as the job id
+        status (SyncJobStatus): Current state of the job
+        payload_path (str): Path of the spooled payload file
+        payload_format (str): 'json' (JSON array) or 'ndjson'
+        submissions (int): Number of submissions coalesced into this job
+        progress (dict, optional): Last progress counters of the sync
+        error (str, optional): Error message of a failed job
+        created_at, started_at, finished_at (datetime): Job lifecycle timestamps
+        updated_at (datetime): Heartbeat refreshed after every sync batch
+    """
+    __tablename__ = 'sync_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.Enum(SyncJobStatus), nullable=False, default=SyncJobStatus.QUEUED)
+    payload_path = db.Column(db.String(500), nullable=False)
+    payload_format = db.Column(db.String(20), nullable=False)
+    submissions = db.Column(db.Integer, nullable=False, default=1)
+    progress = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_sync_job_queued', 'status', unique=True,
+                 postgresql_where=db.text("status = 'QUEUED'")),
+        db.Index('uq_sync_job_running', 'status', unique=True,
+                 postgresql_where=db.text("status = 'RUNNING'")),
+    )
+
+    def __repr__(self):
+        return f'<SyncJob {self.id} {self.status.value}>'
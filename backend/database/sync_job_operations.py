@@ -0,0 +1,246 @@
+# sync_job_operations.py
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from database import db
+from database.sync import SyncJob, SyncJobStatus
+from database.sync_operations import CatalogSync, iter_ndjson_records, iter_json_array_records
+
+SYNC_JOB_COMMIT_EVERY = 5
+SYNC_JOB_STALE_AFTER = timedelta(minutes=15)
+SUBMIT_ATTEMPTS = 3
+
+error_logger = logging.getLogger('error_logger')
+info_logger = logging.getLogger('info_logger')
+
+_worker_thread = None
+_worker_pending = False
+_worker_lock = threading.Lock()
+
+def submit_sync_job(stream, payload_format, spool_dir):
+    """
+    Uloží payload synchronizace do souboru a zařadí ho ke zpracování.
+
+    Pokud už ve frontě čeká jiná úloha, nová úloha se nevytváří - čekající
+    úloze se jen vymění payload za nejnovější (katalog z CDB je vždy úplný
+    snímek) a vrátí se její ID.
+
+    Args:
+        stream: Binární stream s tělem požadavku
+        payload_format: 'json' (JSON pole) nebo 'ndjson'
+        spool_dir: Adresář pro uložené payloady
+
+    Returns:
+        tuple: (SyncJob|None, coalesced: bool, error: str|None)
+    """
+    payload_path = _spool_payload(stream, spool_dir)
+    if not os.path.getsize(payload_path):
+        os.remove(payload_path)
+        return None, False, 'Chybějící data v požadavku'
+
+    try:
+        for _ in range(SUBMIT_ATTEMPTS):
+            now = datetime.utcnow()
+            queued = SyncJob.query.filter_by(status=SyncJobStatus.QUEUED).with_for_update().first()
+            if queued:
+                replaced_path = queued.payload_path
+                queued.payload_path = payload_path
+                queued.payload_format = payload_format
+                queued.submissions += 1
+                queued.updated_at = now
+                db.session.commit()
+                _remove_payload(replaced_path)
+                return queued, True, None
+
+            job = SyncJob(
+                status=SyncJobStatus.QUEUED,
+                payload_path=payload_path,
+                payload_format=payload_format,
+                created_at=now,
+                updated_at=now
+            )
+            db.session.add(job)
+            try:
+                db.session.commit()
+                return job, False, None
+            except IntegrityError:
+                # Souběžně vznikla jiná čekající úloha - připojíme se k ní
+                db.session.rollback()
+
+        _remove_payload(payload_path)
+        return None, False, 'Nepodařilo se zařadit synchronizaci do fronty'
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        _remove_payload(payload_path)
+        return None, False, str(e)
+
+def start_sync_worker(app):
+    """
+    Spustí v tomto procesu vlákno zpracovávající frontu synchronizací,
+    pokud už neběží. Vlákno zpracuje všechny čekající úlohy a skončí.
+    """
+    global _worker_thread, _worker_pending
+    with _worker_lock:
+        _worker_pending = True
+        if _worker_thread is not None:
+            return
+        _worker_thread = threading.Thread(
+            target=_run_worker, args=(app,), name='catalog-sync-worker', daemon=True
+        )
+        _worker_thread.start()
+
+def get_sync_job(job_id):
+    """
+    Získá stav úlohy synchronizace.
+
+    Returns:
+        Dict se stavem, počítadly, dobou běhu a chybou nebo None
+    """
+    job = SyncJob.query.get(job_id)
+    if not job:
+        return None
+    return format_sync_job(job)
+
+def format_sync_job(job):
+    """Helper funkce pro formátování stavu úlohy synchronizace"""
+    end = job.finished_at or (datetime.utcnow() if job.started_at else None)
+    return {
+        'id': job.id,
+        'status': job.status.value,
+        'submissions': job.submissions,
+        'progress': job.progress or {},
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'duration_seconds': (end - job.started_at).total_seconds() if job.started_at else None
+    }
+
+def _run_worker(app):
+    global _worker_thread, _worker_pending
+    try:
+        with app.app_context():
+            while True:
+                with _worker_lock:
+                    _worker_pending = False
+
+                job = _claim_next_job()
+                if job:
+                    _run_job(job)
+                    continue
+
+                # Skončíme jen pokud mezitím nepřišla další úloha
+                with _worker_lock:
+                    if not _worker_pending:
+                        _worker_thread = None
+                        return
+    finally:
+        with _worker_lock:
+            if _worker_thread is threading.current_thread():
+                _worker_thread = None
+
+def _claim_next_job():
+    try:
+        _fail_stale_jobs()
+
+        job = SyncJob.query.filter_by(status=SyncJobStatus.QUEUED)\
+            .order_by(SyncJob.id)\
+            .with_for_update(skip_locked=True)\
+            .first()
+        if not job:
+            db.session.rollback()
+            return None
+
+        now = datetime.utcnow()
+        job.status = SyncJobStatus.RUNNING
+        job.started_at = now
+        job.updated_at = now
+        db.session.commit()
+        return job
+    except IntegrityError:
+        # Jiný proces už synchronizaci spustil, úlohu převezme po jejím dokončení
+        db.session.rollback()
+        return None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        error_logger.error('Chyba při převzetí úlohy synchronizace: %s', str(e))
+        return None
+
+def _fail_stale_jobs():
+    stale_before = datetime.utcnow() - SYNC_JOB_STALE_AFTER
+    SyncJob.query.filter(
+        SyncJob.status == SyncJobStatus.RUNNING,
+        SyncJob.updated_at < stale_before
+    ).update({
+        SyncJob.status: SyncJobStatus.FAILED,
+        SyncJob.error: 'Úloha přestala hlásit průběh a byla ukončena',
+        SyncJob.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+
+def _run_job(job):
+    job_id = job.id
+    payload_path = job.payload_path
+    info_logger.info('Zahájena synchronizace katalogu, úloha %s', job_id)
+
+    def report_progress(sync):
+        job.progress = sync.progress()
+        job.updated_at = datetime.utcnow()
+
+    sync = CatalogSync(commit_every=SYNC_JOB_COMMIT_EVERY, on_batch=report_progress)
+    try:
+        with open(payload_path, 'rb') as payload:
+            if job.payload_format == 'ndjson':
+                records = iter_ndjson_records(payload)
+            else:
+                records = iter_json_array_records(payload)
+
+            sync.start()
+            sync.add_records(records)
+            if not sync.processed_records:
+                raise ValueError('Chybějící data v požadavku')
+            sync.finish()
+
+        now = datetime.utcnow()
+        job.status = SyncJobStatus.SUCCEEDED
+        job.progress = sync.progress()
+        job.finished_at = now
+        job.updated_at = now
+        db.session.commit()
+        info_logger.info('Úloha %s: aktualizováno %d knih, přidáno %d nových knih, přeskočeno %d nezměněných knih',
+                         job_id, sync.updated_books, sync.new_books, sync.unchanged_books)
+    except Exception as e:
+        error_logger.error('Synchronizace katalogu v úloze %s selhala: %s', job_id, str(e))
+        try:
+            sync.abort()
+            now = datetime.utcnow()
+            SyncJob.query.filter_by(id=job_id).update({
+                SyncJob.status: SyncJobStatus.FAILED,
+                SyncJob.progress: sync.progress(),
+                SyncJob.error: str(e),
+                SyncJob.finished_at: now,
+                SyncJob.updated_at: now
+            }, synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError as db_error:
+            db.session.rollback()
+            error_logger.error('Nepodařilo se uložit stav úlohy %s: %s', job_id, str(db_error))
+    finally:
+        _remove_payload(payload_path)
+
+def _spool_payload(stream, spool_dir):
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, payload_path = tempfile.mkstemp(prefix='sync_', suffix='.payload', dir=spool_dir)
+    with os.fdopen(fd, 'wb') as payload:
+        shutil.copyfileobj(stream, payload, 64 * 1024)
+    return payload_path
+
+def _remove_payload(payload_path):
+    try:
+        os.remove(payload_path)
+    except OSError:
+        pass
@@ -0,0 +1,527 @@
+# sync_operations.py
+import codecs
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import and_, exists, literal, null, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database.book import db, Book, book_genres
+from database.audit import AuditLog, AuditEventType
+from database.sync import CatalogSyncIsbn
+from database.genre_operations import (
+    split_genre_names, GenreCache, invalidate_process_genre_cache, refresh_genre_facets
+)
+from database.isbn_operations import refresh_isbn_aliases
+from database.cache_operations import bump_cache_version, CATALOG_CACHE_VERSION, CATALOG_SYNC_VERSION
+
+SYNC_USERNAME = "CDB_SYSTEM"
+SYNC_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+SYNC_LOCK_KEY = 0x43444253         # klíč advisory zámku synchronizace katalogu ('CDBS')
+
+class CatalogSync:
+    """
+    Množinová synchronizace katalogu knih z CDB.
+
+    Příchozí záznamy se zpracovávají po dávkách: každá dávka se nejprve
+    uloží do stagingu (slovník podle ISBN10), existující knihy a žánry se
+    zjistí několika hromadnými dotazy a knihy se zapíšou pomocí
+    INSERT ... ON CONFLICT. Výsledek (počty, viditelnost i auditní záznamy)
+    odpovídá původnímu zpracování záznam po záznamu.
+
+    Přijatá ISBN se ukládají do tabulky catalog_sync_isbn. Viditelnost
+    existujících knih se během dávek nemění; ve finish() se skryté
+    a zobrazené knihy spočítají přímo v databázi, aktualizují se jen řádky,
+    jejichž viditelnost se opravdu mění, a auditní záznamy se vloží
+    hromadně pomocí INSERT ... SELECT. Při průběžném commitování
+    (commit_every) tak katalog během synchronizace nezmizí.
+
+    Synchronizace se navzájem vylučují bez ohledu na vstupní bod (úloha
+    z fronty, synchronní endpoint, proudové zpracování, CLI): start() čeká
+    na advisory zámek SYNC_LOCK_KEY a finish() nebo abort() ho uvolní.
+    Zámek drží samostatné spojení, průběžné commity ho tedy neuvolní.
+
+    Použití:
+        sync = CatalogSync()
+        sync.start()
+        sync.add_records(books_data)
+        updated_books, new_books, unchanged_books = sync.finish()
+    """
+
+    def __init__(self, batch_size=SYNC_BATCH_SIZE, commit_every=None, genre_cache=None,
+                 on_batch=None):
+        """
+        Args:
+            batch_size: Počet záznamů zapisovaných jedním hromadným dotazem
+            commit_every: Po kolika dávkách se průběžně commituje
+                          (None = celá synchronizace v jedné transakci)
+            genre_cache: GenreCache pro překlad žánrů (výchozí je nová
+                         cache platná jen pro tuto synchronizaci)
+            on_batch: Volitelná funkce volaná po každé dávce (před případným
+                      commitem) s instancí CatalogSync, např. pro hlášení průběhu
+        """
+        self.sync_id = str(uuid.uuid4())
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.genre_cache = genre_cache or GenreCache()
+        self.on_batch = on_batch
+        self.processed_records = 0
+        self.invalid_records = 0
+        self.updated_books = 0
+        self.new_books = 0
+        self.unchanged_books = 0
+        self.batches = 0
+        self.commits = 0
+        self._started_at = None
+        self._lock_connection = None
+
+    def start(self):
+        """
+        Připraví synchronizaci - počká na dokončení jiné běžící
+        synchronizace, smaže staging záznamy přerušených synchronizací
+        a načte cache žánrů.
+        """
+        self._acquire_lock()
+        try:
+            # Se zámkem neběží žádná jiná synchronizace, zbylé řádky jsou osiřelé
+            db.session.execute(CatalogSyncIsbn.__table__.delete())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._release_lock()
+            raise
+        self._started_at = time.monotonic()
+        self.genre_cache.preload()
+
+    def add_records(self, records):
+        """
+        Zpracuje záznamy z CDB po dávkách velikosti batch_size.
+
+        Args:
+            records: Iterable slovníků ve formátu CDB
+        """
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._apply_batch(batch)
+                batch = []
+
+        if batch:
+            self._apply_batch(batch)
+
+    def finish(self):
+        """
+        Skryje knihy, které v CDB chybí, zapíše auditní záznamy o skrytých
+        a znovu zobrazených knihách, přepočítá počty knih podle žánrů
+        (genre_facet) a potvrdí transakci.
+
+        Returns:
+            tuple: (počet aktualizovaných knih, počet nových knih,
+                    počet přeskočených nezměněných knih)
+        """
+        staged = CatalogSyncIsbn.__table__
+        book_table = Book.__table__
+        in_sync = staged.c.sync_id == self.sync_id
+        received = exists().where(and_(in_sync, staged.c.isbn10 == book_table.c.ISBN10))
+
+        # Znovu zobrazené: přijaté, dosud neviditelné a nepřidané touto synchronizací
+        shown = select(staged.c.isbn10)\
+            .join(book_table, book_table.c.ISBN10 == staged.c.isbn10)\
+            .where(in_sync, staged.c.is_new == False, book_table.c.is_visible.isnot(True))
+        _insert_audit_from_select(AuditEventType.BOOK_SHOW, shown)
+
+        # Skryté: dosud viditelné knihy, které v CDB chybí
+        hidden = update(book_table)\
+            .where(book_table.c.is_visible == True, ~received)\
+            .values(is_visible=False)\
+            .returning(book_table.c.ISBN10)\
+            .cte('hidden_books')
+        _insert_audit_from_select(AuditEventType.BOOK_HIDE, select(hidden.c.ISBN10))
+
+        # Přijaté knihy - měníme jen řádky, kterým se viditelnost opravdu mění
+        db.session.execute(
+            update(book_table)
+            .where(
+                in_sync,
+                staged.c.isbn10 == book_table.c.ISBN10,
+                book_table.c.is_visible.is_distinct_from(staged.c.is_visible)
+            )
+            .values(is_visible=staged.c.is_visible)
+        )
+
+        db.session.execute(staged.delete().where(in_sync))
+
+        refresh_genre_facets()
+        bump_cache_version(CATALOG_CACHE_VERSION)
+        bump_cache_version(CATALOG_SYNC_VERSION)
+        db.session.commit()
+        self.commits += 1
+        self._release_lock()
+        invalidate_process_genre_cache()
+        return self.updated_books, self.new_books, self.unchanged_books
+
+    def abort(self):
+        """
+        Vrátí nepotvrzenou část synchronizace a smaže její staging záznamy.
+        Dávky potvrzené průběžným commitem zůstávají zapsané.
+        """
+        db.session.rollback()
+        try:
+            db.session.execute(
+                CatalogSyncIsbn.__table__.delete().where(CatalogSyncIsbn.__table__.c.sync_id == self.sync_id)
+            )
+            db.session.commit()
+        finally:
+            self._release_lock()
+
+    def progress(self):
+        """
+        Vrátí průběžné počítadla synchronizace.
+
+        Returns:
+            Dict s počty zpracovaných, neplatných (bez ISBN10), aktualizovaných,
+            nových a nezměněných záznamů, počtem dávek a commitů a dobou běhu
+            v sekundách
+        """
+        duration = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'processed': self.processed_records,
+            'invalid': self.invalid_records,
+            'updated': self.updated_books,
+            'new': self.new_books,
+            'skipped_unchanged': self.unchanged_books,
+            'batches': self.batches,
+            'commits': self.commits,
+            'duration_seconds': round(duration, 3)
+        }
+
+    def _acquire_lock(self):
+        if self._lock_connection is not None:
+            return
+        connection = db.engine.connect()
+        try:
+            connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': SYNC_LOCK_KEY})
+            connection.commit()
+        except Exception:
+            connection.invalidate()
+            connection.close()
+            raise
+        self._lock_connection = connection
+
+    def _release_lock(self):
+        connection, self._lock_connection = self._lock_connection, None
+        if connection is None:
+            return
+        try:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': SYNC_LOCK_KEY})
+            connection.commit()
+        except Exception:
+            # Zavřením spojení databáze zámek uvolní sama
+            connection.invalidate()
+        finally:
+            connection.close()
+
+    def _apply_batch(self, records):
+        # Staging - poslední výskyt ISBN v dávce určuje výsledná data knihy
+        staged = {}
+        occurrences = []
+        for record in records:
+            self.processed_records += 1
+            isbn10 = record.get('isbn10')
+            if not isbn10:
+                self.invalid_records += 1
+                continue
+            occurrences.append((isbn10, record))
+            staged[isbn10] = record
+
+        if not staged:
+            return
+
+        genre_names = {
+            isbn10: split_genre_names(record.get('categories', ''))
+            for isbn10, record in staged.items()
+        }
+        values = {
+            isbn10: _book_values(record, genre_names[isbn10])
+            for isbn10, record in staged.items()
+        }
+
+        # Knihy z dřívějších dávek už jsou v databázi, stačí se zeptat na tuto dávku
+        existing = dict(
+            db.session.query(Book.ISBN10, Book.content_hash).filter(Book.ISBN10.in_(list(staged)))
+        )
+        unchanged = {
+            isbn10 for isbn10, content_hash in existing.items()
+            if content_hash == values[isbn10]['content_hash']
+        }
+
+        # Počítáme každý záznam zvlášť, stejně jako původní zpracování
+        known_isbns = set(existing)
+        new_isbns = set()
+        audit_rows = []
+        for isbn10, record in occurrences:
+            if isbn10 in known_isbns:
+                if isbn10 in unchanged:
+                    self.unchanged_books += 1
+                else:
+                    self.updated_books += 1
+                continue
+
+            self.new_books += 1
+            known_isbns.add(isbn10)
+            new_isbns.add(isbn10)
+            audit_rows.append(_audit_row(
+                AuditEventType.BOOK_ADD,
+                isbn10,
+                {"author": _book_values(record)['Author']}
+            ))
+
+        self._stage_isbns(values, new_isbns)
+
+        # Nezměněné knihy ani jejich vazby na žánry nepřepisujeme
+        changed = [isbn10 for isbn10 in staged if isbn10 not in unchanged]
+        if changed:
+            self._upsert_books([values[isbn10] for isbn10 in changed])
+            refresh_isbn_aliases(changed)
+            self._replace_book_genres({isbn10: genre_names[isbn10] for isbn10 in changed})
+
+        _insert_audit_rows(audit_rows, self.batch_size)
+
+        self.batches += 1
+        if self.on_batch:
+            self.on_batch(self)
+        if self.commit_every and self.batches % self.commit_every == 0:
+            bump_cache_version(CATALOG_CACHE_VERSION)
+            db.session.commit()
+            self.commits += 1
+
+    def _stage_isbns(self, values, new_isbns):
+        stmt = pg_insert(CatalogSyncIsbn.__table__).values([{
+            'sync_id': self.sync_id,
+            'isbn10': isbn10,
+            'is_visible': book_values['is_visible'],
+            'is_new': isbn10 in new_isbns
+        } for isbn10, book_values in values.items()])
+        # Opakované ISBN v pozdější dávce - viditelnost určuje poslední výskyt
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sync_id', 'isbn10'],
+            set_={'is_visible': stmt.excluded.is_visible}
+        )
+        db.session.execute(stmt)
+
+    def _upsert_books(self, rows):
+        book_table = Book.__table__
+        stmt = pg_insert(book_table).values(rows)
+        # Viditelnost existujících knih se nastavuje až ve finish()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[book_table.c.ISBN10],
+            set_={
+                column: stmt.excluded[column]
+                for column in _SYNC_COLUMNS if column not in ('ISBN10', 'is_visible')
+            },
+            # Nezměněné řádky nepřepisujeme, aby nevznikaly mrtvé n-tice a WAL provoz
+            where=book_table.c.content_hash.is_distinct_from(stmt.excluded.content_hash)
+        )
+        db.session.execute(stmt)
+
+    def _replace_book_genres(self, genre_names):
+        genre_ids = self.genre_cache.resolve(
+            name for names in genre_names.values() for name in names
+        )
+
+        db.session.execute(
+            book_genres.delete().where(book_genres.c.book_isbn10.in_(list(genre_names)))
+        )
+
+        links = []
+        for isbn10, names in genre_names.items():
+            for genre_id in dict.fromkeys(genre_ids[name.lower()] for name in names):
+                links.append({'book_isbn10': isbn10, 'genre_id': genre_id})
+
+        if links:
+            db.session.execute(
+                pg_insert(book_genres).values(links).on_conflict_do_nothing()
+            )
+
+def ensure_unlogged_sync_staging():
+    """
+    Převede tabulku catalog_sync_isbn vytvořenou dříve jako běžnou (logovanou)
+    na UNLOGGED a potvrdí transakci. Nové databáze ji tak vytvoří rovnou
+    (db.create_all()).
+
+    Returns:
+        bool: Zda byla tabulka převedena
+    """
+    persistence = db.session.execute(
+        text("SELECT relpersistence FROM pg_class WHERE oid = to_regclass(:name)"),
+        {'name': CatalogSyncIsbn.__tablename__}
+    ).scalar()
+    if persistence != 'p':
+        db.session.rollback()
+        return False
+    db.session.execute(text(f'ALTER TABLE {CatalogSyncIsbn.__tablename__} SET UNLOGGED'))
+    db.session.commit()
+    return True
+
+def _book_values(data, genre_names=None):
+    """
+    Převede záznam z CDB na hodnoty sloupců modelu Book.
+
+    Pokud jsou předány názvy žánrů, doplní i otisk obsahu (content_hash).
+    """
+    authors = data.get('authors')
+    values = {
+        'ISBN10': data.get('isbn10'),
+        'ISBN13': data.get('isbn13'),
+        'Title': data.get('title'),
+        'Author': authors if isinstance(authors, str) else '; '.join(data.get('authors', [])),
+        'Cover_Image': data.get('thumbnail'),
+        'Description': data.get('description'),
+        'Year_of_Publication': data.get('published_year'),
+        'Number_of_Pages': data.get('num_pages'),
+        'Average_Rating': data.get('average_rating'),
+        'Number_of_Ratings': data.get('ratings_count'),
+        'Price': data.get('price'),
+        'is_visible': data.get('price', 0) > 0
+    }
+    if genre_names is not None:
+        values['content_hash'] = content_fingerprint(values, genre_names)
+    return values
+
+_SYNC_COLUMNS = (
+    'ISBN10', 'ISBN13', 'Title', 'Author', 'Cover_Image', 'Description',
+    'Year_of_Publication', 'Number_of_Pages', 'Average_Rating',
+    'Number_of_Ratings', 'Price', 'is_visible', 'content_hash'
+)
+
+# Sloupce, ze kterých se počítá otisk - is_visible se odvozuje z ceny
+_FINGERPRINT_COLUMNS = tuple(
+    column for column in _SYNC_COLUMNS if column not in ('is_visible', 'content_hash')
+)
+
+def content_fingerprint(values, genre_names):
+    """
+    Spočítá otisk obsahu knihy z hodnot sloupců a názvů žánrů.
+
+    Žánry se porovnávají case-insensitive a bez ohledu na pořadí,
+    stejně jako při jejich přiřazení knize.
+
+    Args:
+        values: Dict hodnot sloupců knihy (viz _book_values)
+        genre_names: List názvů žánrů
+
+    Returns:
+        str: Hexadecimální SHA-256 otisk
+    """
+    normalized = [values.get(column) for column in _FINGERPRINT_COLUMNS]
+    normalized.append(sorted({name.lower() for name in genre_names}))
+    payload = json.dumps(normalized, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _audit_row(event_type, isbn, additional_data=None):
+    return {
+        'event_type': event_type,
+        'username': SYNC_USERNAME,
+        'book_isbn': isbn,
+        'additional_data': additional_data,
+        'timestamp': datetime.utcnow()
+    }
+
+def _insert_audit_from_select(event_type, isbn_select):
+    audit_table = AuditLog.__table__
+    isbns = isbn_select.subquery()
+    rows = select(
+        literal(event_type, audit_table.c.event_type.type),
+        literal(datetime.utcnow(), audit_table.c.timestamp.type),
+        literal(SYNC_USERNAME),
+        isbns.c[0],
+        null()
+    )
+    db.session.execute(audit_table.insert().from_select(
+        ['event_type', 'timestamp', 'username', 'book_isbn', 'additional_data'],
+        rows
+    ))
+
+def _insert_audit_rows(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(AuditLog.__table__.insert(), rows[start:start + batch_size])
+
+def iter_ndjson_records(stream):
+    """
+    Postupně čte záznamy ve formátu NDJSON (jeden JSON objekt na řádek).
+
+    Args:
+        stream: Binární stream s tělem požadavku
+
+    Yields:
+        Slovníky jednotlivých záznamů
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f'Neplatný JSON na řádku {line_number}: {str(e)}') from e
+        if not isinstance(record, dict):
+            raise ValueError(f'Řádek {line_number} neobsahuje JSON objekt')
+        yield record
+
+def iter_json_array_records(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Postupně čte záznamy z JSON pole, aniž by celé pole načetl do paměti.
+
+    Args:
+        stream: Binární stream s tělem požadavku
+        chunk_size: Velikost čteného bloku v bajtech
+
+    Yields:
+        Slovníky jednotlivých záznamů
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    array_opened = False
+    eof = False
+
+    while True:
+        # Přeskočíme bílé znaky a oddělovače mezi prvky pole
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ',['):
+            if buffer[position] == '[':
+                if array_opened:
+                    raise ValueError('Vnořená pole nejsou podporována')
+                array_opened = True
+            position += 1
+
+        if position < len(buffer):
+            if not array_opened:
+                raise ValueError('Očekáváno JSON pole')
+            if buffer[position] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+                record = None
+            if record is not None:
+                if not isinstance(record, dict):
+                    raise ValueError('Prvky pole musí být JSON objekty')
+                position = end
+                yield record
+                continue
+
+        if eof:
+            raise ValueError('Neočekávaný konec JSON pole')
+
+        # Zahodíme zpracovanou část bufferu a načteme další blok
+        buffer = buffer[position:]
+        position = 0
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += utf8.decode(chunk, final=eof)
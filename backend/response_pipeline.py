@@ -0,0 +1,168 @@
+import gzip
+import statistics
+import time
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # volitelná závislost
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # volitelná závislost
+    brotli = None
+
+# Typy obsahu, které má smysl komprimovat
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml'
+)
+# Přípony ETagu podle kódování - komprimovaná reprezentace musí mít vlastní silný ETag
+ETAG_ENCODING_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider serializing with orjson.
+
+    Output is compatible with Flask's default provider: keys are sorted
+    (sort_keys), non-string keys are allowed and datetime/date values go
+    through DefaultJSONProvider.default (HTTP date format), as do Decimal,
+    UUID and dataclasses. Unlike the default provider, non-ASCII characters
+    are emitted as UTF-8 instead of \\u escapes.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def setup_response_pipeline(app):
+    """
+    Configure JSON encoding and response compression for the application.
+
+    - Uses OrjsonProvider for jsonify/request.get_json when orjson is installed
+      (JSON_PROVIDER config: 'auto' (default), 'orjson' or 'default')
+    - Compresses responses with brotli (when installed) or gzip, negotiated
+      by the Accept-Encoding header, for compressible content types larger
+      than COMPRESS_MIN_SIZE bytes
+
+    Args:
+        app (Flask): The Flask application instance
+
+    Configuration:
+    - COMPRESS_MIN_SIZE: Minimal body size in bytes to compress (default 1024)
+    - COMPRESS_GZIP_LEVEL: gzip compression level (default 6)
+    - COMPRESS_BROTLI_QUALITY: brotli quality (default 5)
+    """
+    app.config.setdefault('JSON_PROVIDER', 'auto')
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+
+    provider = app.config['JSON_PROVIDER']
+    if provider == 'orjson' or (provider == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('JSON_PROVIDER=orjson vyžaduje nainstalovaný balíček orjson')
+        app.json = OrjsonProvider(app)
+
+    @app.after_request
+    def compress_response(response):
+        return _compress_response(app, response)
+
+def supported_encodings():
+    """Vrátí kódování podporovaná serverem v pořadí preference."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress_body(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'])
+
+def _compress_response(app, response):
+    if response.status_code == 304:
+        # 304 musí nést stejné Vary jako odpověď, kterou revaliduje
+        response.vary.add('Accept-Encoding')
+        return response
+
+    if response.direct_passthrough or response.is_streamed \
+            or response.status_code < 200 or response.status_code in (204, 206) \
+            or 'Content-Encoding' in response.headers \
+            or not _is_compressible(response.mimetype):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.set_data(compress_body(data, encoding, app.config))
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ETAG_ENCODING_SUFFIXES[encoding], weak)
+    return response
+
+def _is_compressible(mimetype):
+    return bool(mimetype) and (
+        mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES or mimetype.endswith('+json')
+    )
+
+def benchmark_responses(app, urls, repeat=20):
+    """
+    Změří velikost a dobu zpracování odpovědí s různými JSON providery a kódováními.
+
+    Každá URL se volá přes testovacího klienta aplikace pro každou kombinaci
+    JSON provideru (výchozí a orjson, je-li nainstalován) a kódování
+    (identity, gzip a br, je-li nainstalován). Podmíněné hlavičky se
+    neposílají, měří se tedy vždy celá odpověď.
+
+    Returns:
+        List dictů s URL, providerem, kódováním, velikostí v bajtech
+        a mediánem doby odpovědi v ms
+    """
+    providers = [('default', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+
+    original_provider = app.json
+    client = app.test_client()
+    results = []
+    try:
+        for url in urls:
+            for provider_name, provider in providers:
+                app.json = provider
+                for encoding in ('identity',) + supported_encodings():
+                    timings = []
+                    size = 0
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        response = client.get(url, headers={'Accept-Encoding': encoding})
+                        size = len(response.get_data())
+                        timings.append((time.perf_counter() - started) * 1000)
+                    results.append({
+                        'url': url,
+                        'status': response.status_code,
+                        'provider': provider_name,
+                        'encoding': encoding,
+                        'bytes': size,
+                        'ms': round(statistics.median(timings), 2)
+                    })
+    finally:
+        app.json = original_provider
+    return results
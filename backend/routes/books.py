@@ -1,17 +1,30 @@
 import logging
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session, url_for
 from database.book_operations import (
     search_books,
     get_book_by_isbn,
-    get_all_unique_genres,
+    get_books_by_isbns,
+    get_genre_facets,
+    get_search_genre_facets,
     fetch_and_update_books,
-    get_favorite_books
+    stream_and_update_books,
+    get_favorite_books,
+    get_catalog_cache_stats,
+    get_catalog_version,
+    parse_fields
 )
+from database.favorite_operations import get_favorites_version
+from database.autocomplete_operations import get_autocomplete_suggestions, AUTOCOMPLETE_LIMIT
+from database.sync_operations import iter_ndjson_records, iter_json_array_records
+from database.sync_job_operations import submit_sync_job, start_sync_worker, get_sync_job
+from routes.http_cache import conditional_response
 
 bp = Blueprint('books', __name__)
 error_logger = logging.getLogger('error_logger')
 info_logger = logging.getLogger('info_logger')
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
 @bp.route('/api/books')
 def get_books():
     """
@@ -19,54 +32,112 @@ def get_books():
 
     Query Parameters:
     - page (int, optional): Page number for pagination. Defaults to 1.
+    - cursor (str, optional): Opaque next_cursor token from a previous response.
+      Continues right after the last returned book (keyset pagination), so every
+      page costs the same regardless of depth. When given, page is ignored.
     - per_page (int, optional): Number of books per page. Defaults to 25.
+    - q (str, optional): Full-text search in title, author and description,
+      results are ordered by relevance. Supports "quoted phrases", OR and -exclusion.
+      Can be combined with the other filters.
     - title (str, optional): Filter books by title (partial match).
     - author (str, optional): Filter books by author (partial match).
     - isbn (str, optional): Filter books by ISBN (partial match).
     - genres (str, optional): Filter books by genres (comma-separated).
     - favorites (str, optional): If 'true', retrieves user's favorite books.
+    - count (str, optional): How total_books is computed. 'exact' (default) counts in
+      the same statement as the page (count(*) OVER ()), 'estimate' uses the
+      PostgreSQL planner row estimate, 'none' skips the total (infinite scroll).
+    - fields (str, optional): Comma-separated book fields to return, or a named
+      projection ('card': ISBN10, ISBN13, Title, Author, Cover_Image, Price).
+      Only the columns of these fields are read from the database. ISBN10 is
+      always included. Defaults to all fields.
+    - facets (str, optional): 'genres' adds the number of matching books per genre
+      for the current filters (computed in one aggregate query). Not available
+      together with favorites=true.
 
     Returns:
     JSON object containing:
     - books: List of book data matching the search criteria
-    - total_books: Total number of books matching the search
+    - total_books: Total number of books matching the search (estimated for
+      count=estimate, null for count=none)
     - page: Current page number
     - per_page: Number of books per page
-    - total_pages: Total number of pages
+    - total_pages: Total number of pages (null for count=none)
+    - next_cursor: Token for the next page (cursor parameter), null on the last page
+    - facets: Only with facets=genres - {'genres': [{'name': str, 'count': int}, ...]}
+      ordered by count descending
 
     Raises:
+    400 Bad Request if the cursor, the count mode, the fields or the facets are invalid
     500 Internal Server Error if there's an issue retrieving books
+
+    Conditional GET: the response carries a strong ETag derived from the catalog
+    version (and the favorites version for favorites=true) plus the query
+    parameters; a matching If-None-Match returns 304 without running the search.
     """
+    versions = {'catalog': get_catalog_version()}
+    if request.args.get('favorites', '').lower() == 'true' and session.get('user_id'):
+        versions['favorites'] = get_favorites_version()
+    return conditional_response(versions, _get_books_response)
+
+def _get_books_response():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 25, type=int)
+    cursor = request.args.get('cursor', '')
+    count_mode = request.args.get('count', 'exact').lower()
+    fulltext_query = request.args.get('q', '')
     title_query = request.args.get('title', '')
     author_query = request.args.get('author', '')
     isbn_query = request.args.get('isbn', '')
     genres_query = request.args.get('genres', '')
     show_favorites = request.args.get('favorites', '').lower() == 'true'
+    facets_query = [facet.strip() for facet in request.args.get('facets', '').split(',') if facet.strip()]
     user_id = session.get('user_id')
 
     try:
+        fields = parse_fields(request.args.get('fields', ''))
+        if any(facet != 'genres' for facet in facets_query):
+            raise ValueError("Neplatný parametr facets, povolená hodnota: genres")
+        if facets_query and show_favorites and user_id:
+            raise ValueError('Parametr facets nelze kombinovat s oblíbenými knihami')
+
+        next_cursor = None
         if show_favorites and user_id:
-            books_data, total_books = get_favorite_books(user_id, page, per_page)
+            books_data, total_books = get_favorite_books(user_id, page, per_page, count=count_mode, fields=fields)
         else:
-            books_data, total_books = search_books(
+            books_data, total_books, next_cursor = search_books(
                 title=title_query,
                 authors=author_query,
                 isbn=isbn_query,
                 genres=genres_query,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                q=fulltext_query,
+                cursor=cursor,
+                count=count_mode,
+                fields=fields
             )
 
-        return jsonify({
+        response = {
             'books': books_data,
             'total_books': total_books,
             'page': page,
             'per_page': per_page,
-            'total_pages': (total_books + per_page - 1) // per_page
-        })
+            'total_pages': (total_books + per_page - 1) // per_page if total_books is not None else None,
+            'next_cursor': next_cursor
+        }
+        if facets_query:
+            response['facets'] = {'genres': get_search_genre_facets(
+                title=title_query,
+                authors=author_query,
+                isbn=isbn_query,
+                genres=genres_query,
+                q=fulltext_query
+            )}
+        return jsonify(response)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         error_logger.error('Chyba při získávání knih: %s', str(e))
         return jsonify({'error': 'Nepodařilo se získat knihy'}), 500
@@ -78,33 +149,153 @@ def fetch_books():
 
     Expects a JSON payload containing book data.
 
+    Streaming mode:
+    - Content-Type application/x-ndjson: one JSON book object per line
+    - Query parameter stream=true with a JSON array body: the array is parsed incrementally
+    In streaming mode books are written in bounded batches with periodic commits.
+
+    Query parameter async=true submits the payload as a background sync job
+    instead (see /api/fetch_books/jobs).
+
     Returns:
     JSON object with a message indicating:
     - Number of books updated
     - Number of new books added
+    - Number of unchanged books that were skipped
+    and the same counts as 'updated', 'new' and 'skipped_unchanged'.
+    In streaming mode the object also contains a 'progress' dict with
+    processed, invalid, updated, new and skipped_unchanged counts, batches,
+    commits and duration.
 
     Raises:
-    400 Bad Request if no book data is provided
+    400 Bad Request if no book data is provided or the stream is malformed
     500 Internal Server Error if there's an issue processing the books
     """
     info_logger.info('Zahájeno přijímání dat knih od klienta')
+
+    if request.args.get('async', '').lower() == 'true':
+        return submit_sync_job_endpoint()
+
+    if request.mimetype in NDJSON_MIMETYPES or request.args.get('stream', '').lower() == 'true':
+        return _stream_books()
+
     try:
         books_data = request.get_json()
         if not books_data:
             error_logger.error('Chybějící data v požadavku')
             return jsonify({'error': 'Chybějící data v požadavku'}), 400
 
-        updated_books, new_books = fetch_and_update_books(books_data)
+        updated_books, new_books, unchanged_books = fetch_and_update_books(books_data)
 
-        info_logger.info('Aktualizováno %d knih, přidáno %d nových knih', updated_books, new_books)
+        info_logger.info('Aktualizováno %d knih, přidáno %d nových knih, přeskočeno %d nezměněných knih',
+                         updated_books, new_books, unchanged_books)
         return jsonify({
-            'message': f'Aktualizováno {updated_books} knih, přidáno {new_books} nových knih'
+            'message': f'Aktualizováno {updated_books} knih, přidáno {new_books} nových knih, '
+                       f'přeskočeno {unchanged_books} nezměněných knih',
+            'updated': updated_books,
+            'new': new_books,
+            'skipped_unchanged': unchanged_books
         }), 200
 
     except Exception as e:
         error_logger.error('Výjimka při zpracování knih: %s', str(e))
         return jsonify({'error': str(e)}), 500
 
+def _stream_books():
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = iter_ndjson_records(request.stream)
+    else:
+        records = iter_json_array_records(request.stream)
+
+    try:
+        progress = stream_and_update_books(records)
+    except ValueError as e:
+        error_logger.error('Neplatná data v proudu knih: %s', str(e))
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_logger.error('Výjimka při zpracování knih: %s', str(e))
+        return jsonify({'error': str(e)}), 500
+
+    if not progress['processed']:
+        error_logger.error('Chybějící data v požadavku')
+        return jsonify({'error': 'Chybějící data v požadavku'}), 400
+
+    info_logger.info('Aktualizováno %d knih, přidáno %d nových knih, přeskočeno %d nezměněných knih '
+                     '(zpracováno %d záznamů v %d dávkách)',
+                     progress['updated'], progress['new'], progress['skipped_unchanged'],
+                     progress['processed'], progress['batches'])
+    return jsonify({
+        'message': f'Aktualizováno {progress["updated"]} knih, přidáno {progress["new"]} nových knih, '
+                   f'přeskočeno {progress["skipped_unchanged"]} nezměněných knih',
+        'updated': progress['updated'],
+        'new': progress['new'],
+        'skipped_unchanged': progress['skipped_unchanged'],
+        'progress': progress
+    }), 200
+
+@bp.route('/api/fetch_books/jobs', methods=['POST'])
+def submit_sync_job_endpoint():
+    """
+    Submit book data received from a client as a background sync job.
+
+    Accepts the same payloads as /api/fetch_books (JSON array or NDJSON).
+    The body is spooled to disk and processed by an in-process worker thread,
+    so the request returns immediately. Only one sync runs at a time, direct
+    syncs through /api/fetch_books and the CLI wait for the running one too;
+    while a job is waiting in the queue, further submissions replace its
+    payload and return the same job id.
+
+    Returns:
+    - 202 Accepted: JSON object with job_id, status, coalesced flag and status_url
+    - 400 Bad Request if no book data is provided
+    - 500 Internal Server Error if the job could not be queued
+    """
+    payload_format = 'ndjson' if request.mimetype in NDJSON_MIMETYPES else 'json'
+    job, coalesced, error = submit_sync_job(
+        request.stream, payload_format, current_app.config['SYNC_JOB_DIR']
+    )
+
+    if not job:
+        error_logger.error('Nepodařilo se zařadit synchronizaci: %s', error)
+        status_code = 400 if error == 'Chybějící data v požadavku' else 500
+        return jsonify({'error': error}), status_code
+
+    start_sync_worker(current_app._get_current_object())
+
+    info_logger.info('Synchronizace katalogu zařazena jako úloha %s (sloučeno: %s)', job.id, coalesced)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status.value,
+        'coalesced': coalesced,
+        'status_url': url_for('books.get_sync_job_endpoint', job_id=job.id)
+    }), 202
+
+@bp.route('/api/fetch_books/jobs/<int:job_id>')
+def get_sync_job_endpoint(job_id):
+    """
+    Retrieve the status of a background sync job.
+
+    Returns:
+    JSON object containing:
+    - id, status (queued, running, succeeded, failed)
+    - submissions: number of submissions coalesced into the job
+    - progress: processed, invalid, updated, new and skipped_unchanged counts,
+      batches, commits and duration of the sync
+    - error: error message of a failed job
+    - created_at, started_at, finished_at, duration_seconds
+
+    Raises:
+    404 Not Found if the job doesn't exist
+    """
+    try:
+        job = get_sync_job(job_id)
+        if not job:
+            return jsonify({'error': 'Úloha nebyla nalezena'}), 404
+        return jsonify({'job': job})
+    except Exception as e:
+        error_logger.error('Chyba při získávání stavu úlohy %s: %s', job_id, str(e))
+        return jsonify({'error': 'Interní chyba serveru'}), 500
+
 @bp.route('/api/books/<isbn>')
 def get_book_endpoint(isbn):
     """
@@ -120,7 +311,16 @@ def get_book_endpoint(isbn):
     Raises:
     404 Not Found if the book doesn't exist or is not visible to the user
     500 Internal Server Error if there's an issue retrieving the book details
+
+    Conditional GET: ETag from the catalog version (plus the favorites version
+    for logged-in users, whose response contains is_favorite).
     """
+    versions = {'catalog': get_catalog_version()}
+    if session.get('user_id'):
+        versions['favorites'] = get_favorites_version()
+    return conditional_response(versions, lambda: _get_book_response(isbn))
+
+def _get_book_response(isbn):
     try:
         book_data = get_book_by_isbn(isbn, session.get('user_id'))
 
@@ -134,6 +334,47 @@ def get_book_endpoint(isbn):
         error_logger.error('Chyba při získávání detailu knihy %s: %s', isbn, str(e))
         return jsonify({'error': 'Interní chyba serveru'}), 500
 
+@bp.route('/api/books/batch', methods=['POST'])
+def get_books_batch_endpoint():
+    """
+    Retrieve details of many books at once by their ISBNs.
+
+    Replaces a loop of /api/books/<isbn> calls: the books are resolved with
+    a constant number of queries regardless of how many ISBNs are requested.
+
+    Request Body:
+    JSON object {"isbns": [...]} with up to MAX_BATCH_ISBNS (500) ISBN10 or
+    ISBN13 strings, hyphens and spaces are allowed. Duplicates are ignored.
+
+    Returns:
+    JSON object containing:
+    - books: Object keyed by each ISBN exactly as it was sent (not normalized,
+      so clients can look up their own values), the value is the same book
+      detail as returned by /api/books/<isbn> (including is_favorite for the
+      logged-in user), or null if the book doesn't exist or is not visible
+    - not_found: List of requested ISBNs that were not found
+
+    Raises:
+    400 Bad Request if isbns is missing, not a list of strings or too long
+    500 Internal Server Error if there's an issue retrieving the books
+    """
+    data = request.get_json(silent=True) or {}
+    isbns = data.get('isbns') if isinstance(data, dict) else None
+    if not isinstance(isbns, list) or not all(isinstance(isbn, str) for isbn in isbns):
+        return jsonify({'error': 'Očekáván seznam ISBN v poli isbns'}), 400
+
+    try:
+        books = get_books_by_isbns(isbns, session.get('user_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_logger.error('Chyba při hromadném získávání knih: %s', str(e))
+        return jsonify({'error': 'Interní chyba serveru'}), 500
+
+    not_found = [isbn for isbn, book_data in books.items() if book_data is None]
+    info_logger.info('Hromadně získáno %d knih, nenalezeno %d', len(books) - len(not_found), len(not_found))
+    return jsonify({'books': books, 'not_found': not_found})
+
 @bp.route('/api/genres')
 def get_genres_endpoint():
     """
@@ -142,20 +383,75 @@ def get_genres_endpoint():
     Returns:
     JSON object containing:
     - genres: List of all unique book genres
+    - counts: Number of visible books per genre, {genre name: count}
     - total_genres: Total number of unique genres
+
+    The counts are read from the genre_facet summary table, which is
+    refreshed at the end of every catalog sync.
     
     Raises:
     500 Internal Server Error if there's an issue retrieving the genres
+
+    Conditional GET: ETag from the catalog version, the response is public.
     """
+    return conditional_response({'catalog': get_catalog_version()}, _get_genres_response, private=False)
+
+def _get_genres_response():
     try:
-        genres = get_all_unique_genres()
+        facets = get_genre_facets()
+        genres = [facet['name'] for facet in facets]
 
         info_logger.info('Úspěšně získány všechny unikátní žánry. Počet: %d', len(genres))
 
         return jsonify({
             'genres': genres,
+            'counts': {facet['name']: facet['count'] for facet in facets},
             'total_genres': len(genres)
         })
     except Exception as e:
         error_logger.error('Chyba při získávání žánrů: %s', str(e))
         return jsonify({'error': 'Nepodařilo se získat žánry'}), 500
+
+@bp.route('/api/autocomplete')
+def get_autocomplete_endpoint():
+    """
+    Suggest book titles, authors and genres for the search box (typeahead).
+
+    Answers from an in-memory prefix index of the visible catalog, no database
+    query runs per request. The index is built at startup and rebuilt after
+    every catalog sync. Matching ignores case and diacritics and matches the
+    start of any word ("cap" suggests "Karel Čapek").
+
+    Query Parameters:
+    - prefix (str): Text typed so far
+    - limit (int, optional): Number of suggestions. Defaults to 10, at most 50.
+
+    Returns:
+    JSON object containing:
+    - prefix: The requested prefix
+    - suggestions: List of {'type': 'title'|'author'|'genre', 'text': str,
+      'weight': int, 'isbn10': str (titles only)}, ordered by the number
+      of ratings (summed over the books of an author or genre)
+    """
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({'error': 'Parametr limit musí být kladný'}), 400
+
+    suggestions = get_autocomplete_suggestions(current_app._get_current_object(), prefix, limit)
+    return jsonify({'prefix': prefix, 'suggestions': suggestions})
+
+@bp.route('/api/cache/stats')
+def get_cache_stats_endpoint():
+    """
+    Retrieve statistics of the process-local catalog cache.
+
+    The statistics belong to the worker process that serves the request.
+
+    Returns:
+    JSON object containing:
+    - catalog: Catalog version the cache was filled at and number of invalidations
+    - books, searches, genres: For each cache its size, maxsize, ttl_seconds,
+      hits, misses, hit_ratio, evictions and expirations
+    """
+    return jsonify(get_catalog_cache_stats())
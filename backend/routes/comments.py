@@ -4,8 +4,11 @@ from database.comment_operations import (
     add_comment,
     get_comments_for_book,
     delete_comment,
-    get_formatted_comments_for_book
+    get_formatted_comments_for_book,
+    get_comments_version
 )
+from database.book_operations import get_catalog_version
+from routes.http_cache import conditional_response
 
 bp = Blueprint('comments', __name__)
 error_logger = logging.getLogger('error_logger')
@@ -33,7 +36,14 @@ def get_book_comments_endpoint(isbn):
 
     Raises:
     404 Not Found if there's an issue retrieving comments for the book
+
+    Conditional GET: ETag from the comments version and the catalog version
+    (book visibility), the response is public.
     """
+    versions = {'comments': get_comments_version(), 'catalog': get_catalog_version()}
+    return conditional_response(versions, lambda: _get_book_comments_response(isbn), private=False)
+
+def _get_book_comments_response(isbn):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
@@ -5,6 +5,7 @@ from database.favorite_operations import (
     get_formatted_favorite_books,
     is_book_favorite
 )
+from database.book_operations import parse_fields
 
 bp = Blueprint('favorites', __name__)
 error_logger = logging.getLogger('error_logger')
@@ -20,6 +21,10 @@ def get_favorite_books_endpoint():
     Query Parameters:
     - page (int, optional): Page number for pagination. Defaults to 1.
     - per_page (int, optional): Number of books per page. Defaults to 25.
+    - fields (str, optional): Comma-separated book fields to return, or a named
+      projection ('card': ISBN10, ISBN13, Title, Author, Cover_Image, Price).
+      Only the columns of these fields are read from the database. ISBN10 is
+      always included. Defaults to all fields.
 
     Returns:
     JSON object containing:
@@ -31,7 +36,7 @@ def get_favorite_books_endpoint():
 
     Raises:
     401 Unauthorized: User not logged in
-    400 Bad Request: Error retrieving favorite books
+    400 Bad Request: Error retrieving favorite books or invalid fields
     """
     user_id = session.get('user_id')
     if not user_id:
@@ -39,8 +44,12 @@ def get_favorite_books_endpoint():
 
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 25, type=int)
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    result = get_formatted_favorite_books(user_id, page, per_page)
+    result = get_formatted_favorite_books(user_id, page, per_page, fields)
 
     if result.get('error'):
         error_logger.error('Chyba při získávání oblíbených knih: %s', result['error'])
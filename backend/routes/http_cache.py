@@ -0,0 +1,77 @@
+import hashlib
+import json
+from flask import current_app, make_response, request, session
+from response_pipeline import ETAG_ENCODING_SUFFIXES
+
+# Jak dlouho (v sekundách) smí reverzní proxy servírovat anonymní odpověď bez revalidace
+SHARED_MAX_AGE = 30
+
+def conditional_response(versions, build_response, private=None):
+    """
+    Answer a GET request with ETag / If-None-Match support.
+
+    The strong ETag is derived from the versions of the content the response
+    depends on, the request path and query parameters (and the user for
+    private responses). When the client already has the current representation,
+    304 Not Modified is returned without calling build_response, so no query
+    runs and nothing is serialized.
+
+    Anonymous responses are marked public with a short s-maxage so a reverse
+    proxy can cache them; responses for logged-in users are private and must
+    be revalidated.
+
+    Args:
+        versions (dict): Content versions the response depends on, e.g. {'catalog': 12}
+        build_response (callable): Builds the full response (anything make_response accepts)
+        private (bool, optional): Whether the response depends on the logged-in user.
+                                  Defaults to True when a user is logged in.
+
+    Returns:
+        Response: 304 response or the built response with ETag and Cache-Control
+    """
+    user_id = session.get('user_id')
+    if private is None:
+        private = user_id is not None
+
+    # Bez známé verze nelze ETag spočítat - odpověď se vrátí bez cachování
+    if any(version is None for version in versions.values()):
+        return build_response()
+
+    etag = _compute_etag(versions, user_id if private else None)
+
+    cached_etag = _find_client_etag(etag)
+    if cached_etag:
+        response = current_app.response_class(status=304)
+        response.set_etag(cached_etag)
+    else:
+        response = make_response(build_response())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+
+    if private:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = SHARED_MAX_AGE
+    response.vary.add('Cookie')
+    return response
+
+def _find_client_etag(etag):
+    # Komprimované odpovědi nesou ETag s příponou kódování (viz response_pipeline),
+    # 304 musí vrátit stejný ETag, jaký klient poslal
+    for suffix in ('',) + tuple(ETAG_ENCODING_SUFFIXES.values()):
+        if request.if_none_match.contains(etag + suffix):
+            return etag + suffix
+    return None
+
+def _compute_etag(versions, user_id):
+    key = json.dumps([
+        sorted(versions.items()),
+        request.path,
+        sorted(request.args.items(multi=True)),
+        user_id
+    ], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
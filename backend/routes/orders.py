@@ -6,6 +6,10 @@ from database.order_operations import (
     get_user_orders,
     update_order_status
 )
+from database.idempotency_operations import (
+    claim_idempotency_key,
+    release_idempotency_key
+)
 
 bp = Blueprint('orders', __name__)
 error_logger = logging.getLogger('error_logger')
@@ -22,10 +26,25 @@ def create_new_order():
     - Validates shipping and billing address details
     - Calls the create_order database operation
 
+    Prices are computed on the server from the catalog. cart_items contain
+    'isbn', 'quantity' and optionally 'price'; the client's prices,
+    payment_fee and total_price must match the server pricing within 0.01.
+
     Returns:
     - 201: Order successfully created with order details
     - 400: Missing or invalid order information 
     - 401: User not authenticated
+    - 409: Client prices differ from the catalog, the response contains
+      'mismatches' and the current 'pricing'
+    - 422: Idempotency-Key was already used for a different request
+
+    Headers:
+    - Idempotency-Key (optional): Client-generated unique key of the order.
+      A retry with the same key and body within 24 hours returns the
+      original 201 response (with 'Idempotent-Replayed: true') instead of
+      creating another order. The key is committed together with the order;
+      a concurrent duplicate waits for the first request to finish. Failed
+      attempts do not consume the key.
 
     Expected JSON payload:
     {
@@ -67,6 +86,20 @@ def create_new_order():
             if not address.get(field):
                 return jsonify({'error': f'{field} v {address_type} je povinný'}), 400
 
+    # Opakovaný požadavek se stejným klíčem dostane původní odpověď
+    claim_id = None
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None:
+        claim = claim_idempotency_key(user_id, idempotency_key, data)
+        if claim.get('error'):
+            return jsonify({'error': claim['error']}), claim['status_code']
+        if 'response' in claim:
+            info_logger.info('Objednávka uživatele %s vrácena podle Idempotency-Key', user_id)
+            response = jsonify(claim['response'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response, claim['status_code']
+        claim_id = claim['claimed']
+
     result = create_order(
         user_id=user_id,
         cart_items=data['cart_items'],
@@ -75,9 +108,18 @@ def create_new_order():
         billing_address=data['billing_address'],
         payment_method=data['payment_method'],
         payment_fee=data['payment_fee'],
-        total_price=data['total_price']
+        total_price=data['total_price'],
+        idempotency_claim=claim_id
     )
 
+    if claim_id is not None and result.get('error'):
+        release_idempotency_key()
+
+    if result.get('pricing'):
+        info_logger.info('Objednávka uživatele %s odmítnuta, neaktuální ceny: %s',
+                        user_id, ', '.join(result['mismatches']))
+        return jsonify(result), 409
+
     if result.get('error'):
         error_logger.error('Vytvoření objednávky pro uživatele ID %s selhalo', user_id)
         return jsonify({'error': result['error']}), 400
@@ -122,27 +164,56 @@ def get_order_detail(order_id):
 @bp.route('/api/orders', methods=['GET'])
 def get_orders():
     """
-    Retrieve all orders for the authenticated user.
+    Retrieve the authenticated user's orders, newest first.
 
-    Fetches a list of all orders associated with the current user.
+    Without any of the query parameters below all orders are returned
+    (response with 'orders' and 'total_orders' only). With any of them the
+    response is one page.
+
+    Query Parameters:
+    - page (int, optional): Page number for pagination. Defaults to 1.
+    - per_page (int, optional): Number of orders per page. Defaults to 25.
+    - cursor (str, optional): Opaque next_cursor token from a previous response.
+      Continues right after the last returned order. When given, page is ignored.
+
+    Items and book titles of the whole page are loaded in bulk, so the number
+    of queries per page does not depend on the number of orders or items.
 
     Returns:
     - 200: Orders successfully retrieved
     - 401: User not authenticated
-    - 400: Error retrieving user orders
+    - 400: Invalid cursor or error retrieving user orders
 
     Response includes:
     {
         'orders': [
             # List of order objects
-        ]
+        ],
+        'total_orders': int,
+        'page': int,
+        'per_page': int,
+        'total_pages': int,
+        'next_cursor': str or null  # null on the last page
     }
     """
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({'error': 'Uživatel není přihlášen'}), 401
 
-    result = get_user_orders(user_id)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 25, type=int)
+    cursor = request.args.get('cursor', '')
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'Parametry page a per_page musí být kladné'}), 400
+
+    # Bez parametrů stránkování se vrací celá historie (zpětná kompatibilita)
+    if not any(name in request.args for name in ('page', 'per_page', 'cursor')):
+        per_page = None
+
+    try:
+        result = get_user_orders(user_id, page, per_page, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     if result.get('error'):
         return jsonify({'error': result['error']}), 400
@@ -6,6 +6,7 @@ from database.cart_operations import (
     is_book_in_shopping_cart,
     clear_shopping_cart
 )
+from database.book_operations import parse_fields
 
 bp = Blueprint('shopping_cart', __name__)
 error_logger = logging.getLogger('error_logger')
@@ -21,9 +22,14 @@ def get_cart_books_endpoint():
     Query Parameters:
     - page (int, optional): Page number for pagination. Defaults to 1.
     - per_page (int, optional): Number of items per page. Defaults to 25.
+    - fields (str, optional): Comma-separated book fields to return, or a named
+      projection ('card': ISBN10, ISBN13, Title, Author, Cover_Image, Price).
+      Only the columns of these fields are read from the database. ISBN10 is
+      always included. Defaults to all fields.
 
     Returns:
     - 200: Successfully retrieved cart books
+    - 400: Invalid fields
     - 401: Error retrieving cart books
 
     Response format:
@@ -40,8 +46,12 @@ def get_cart_books_endpoint():
     """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 25, type=int)
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    result = get_formatted_shopping_cart(page, per_page)
+    result = get_formatted_shopping_cart(page, per_page, fields)
 
     if result.get('error'):
         error_logger.error('Chyba při získávání knih v košíku: %s', result['error'])
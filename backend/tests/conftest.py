@@ -0,0 +1,67 @@
+import os
+import sys
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+from database.schema import ensure_search_schema
+
+# Testy potřebují vlastní prázdnou databázi PostgreSQL - tabulky se na konci smažou
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+@pytest.fixture(scope='session')
+def app():
+    """Aplikace nad testovací databází (bez blueprintů a startovních úloh app.py)."""
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL není nastavena')
+
+    # Registrace všech modelů pro create_all
+    import database.book_operations  # noqa: F401
+    import database.cart_operations  # noqa: F401
+    import database.order_operations  # noqa: F401
+    import database.comment  # noqa: F401
+    import database.rating  # noqa: F401
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = TEST_DATABASE_URL
+    app.config['TESTING'] = True
+    db.init_app(app)
+
+    with app.app_context():
+        ensure_search_schema(use_unaccent=False)
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Vrátí context manager, který počítá SQL příkazy odeslané do databáze.
+
+    Usage:
+        with count_queries() as statements:
+            ...
+        assert len(statements) == 2
+    """
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
@@ -0,0 +1,76 @@
+"""
+Regresní testy počtu SQL dotazů seznamových stránek knih.
+
+Stránka katalogu, oblíbených knih i košíku musí stát stejný počet dotazů
+bez ohledu na počet knih na stránce (žánry se načítají hromadně,
+ne přes book.genres pro každou knihu).
+"""
+import pytest
+from database import db
+from database.book import Book, book_genres
+from database.book_operations import COUNT_EXACT, _search_books, get_cart_books, get_favorite_books
+from database.cart_item import CartItem
+from database.genre import Genre
+from database.user import User, favorite_books
+
+BOOK_COUNT = 25
+PAGE_SIZES = (1, BOOK_COUNT)
+
+@pytest.fixture(scope='module')
+def user_id(app):
+    """Uživatel s BOOK_COUNT knihami (každá se dvěma žánry) v oblíbených i v košíku."""
+    genres = [Genre(name='Fiction'), Genre(name='History')]
+    user = User(username='query-count', password='x', name='Query Count')
+    books = [
+        Book(
+            ISBN10=f'{index:010d}',
+            ISBN13=f'{index:013d}',
+            Title=f'Book {index:02d}',
+            Author='Author',
+            Price=100.0,
+            is_visible=True
+        )
+        for index in range(BOOK_COUNT)
+    ]
+    db.session.add_all(genres + books + [user])
+    db.session.flush()
+
+    db.session.execute(book_genres.insert(), [
+        {'book_isbn10': book.ISBN10, 'genre_id': genre.id} for book in books for genre in genres
+    ])
+    db.session.execute(favorite_books.insert(), [
+        {'user_id': user.id, 'book_isbn10': book.ISBN10} for book in books
+    ])
+    db.session.add_all(CartItem(user_id=user.id, book_isbn10=book.ISBN10) for book in books)
+    db.session.commit()
+    return user.id
+
+def _queries_per_page(count_queries, read_page):
+    counts = {}
+    for per_page in PAGE_SIZES:
+        db.session.expunge_all()
+        with count_queries() as statements:
+            books_data = read_page(per_page)
+        assert len(books_data) == per_page
+        assert all(book['Genres'] == ['Fiction', 'History'] for book in books_data)
+        counts[per_page] = len(statements)
+    return counts
+
+def test_catalog_page_query_count_is_constant(user_id, count_queries):
+    counts = _queries_per_page(count_queries, lambda per_page: _search_books(
+        None, None, None, None, 1, per_page, None, None, COUNT_EXACT, None
+    )[0])
+    # Stránka s počtem (okenní funkcí) a žánry
+    assert counts == {per_page: 2 for per_page in PAGE_SIZES}
+
+def test_favorites_page_query_count_is_constant(user_id, count_queries):
+    counts = _queries_per_page(count_queries, lambda per_page: get_favorite_books(
+        user_id, 1, per_page
+    )[0])
+    assert counts == {per_page: 2 for per_page in PAGE_SIZES}
+
+def test_cart_page_query_count_is_constant(user_id, count_queries):
+    counts = _queries_per_page(count_queries, lambda per_page: get_cart_books(
+        user_id, 1, per_page
+    )[0])
+    assert counts == {per_page: 2 for per_page in PAGE_SIZES}